@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Throughput and tail latency of micro-batched NLU vs the per-message path.
+
+Drives `RasaChatbotServer.process_message` with a `StubAgent` whose graph
+run has a fixed overhead plus a per-message cost, so the comparison shows
+how much of that overhead batching amortises at a given concurrency. Only the
+overhead is shared: DIET still predicts each message of a batch on its own.
+Use `--calibrate` to take both costs from a trained model; the defaults are
+placeholders.
+
+    python benchmarks/bench_batching.py --calibrate models/latest.tar.gz --senders 200 --batch-size 32
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List, Text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stubs import StubAgent, add_cost_arguments, resolve_costs  # noqa: E402
+from fast_path import load_examples  # noqa: E402
+from rasa_server import RasaChatbotServer  # noqa: E402
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+
+async def run_mode(name: Text, batch_size: int, args) -> Dict[Text, Any]:
+    server = RasaChatbotServer(
+        max_in_flight=args.senders * args.messages,
+        nlu_batch_size=batch_size,
+        nlu_batch_wait_ms=args.wait_ms,
+        response_cache_size=0,
+    )
+    server.agent = StubAgent(args.graph_overhead_ms, args.per_message_ms, args.policy_ms)
+    server.prepare_agent(server.agent)
+    texts = [t for examples in load_examples().values() for t in examples]
+    rng = random.Random(42)
+    latencies: List[float] = []
+
+    async def sender(i: int):
+        for _ in range(args.messages):
+            started = time.perf_counter()
+            await server.process_message(f"sender-{i}", rng.choice(texts))
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(sender(i) for i in range(args.senders)))
+    wall = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "mode": name,
+        "messages": len(latencies),
+        "throughput_msg_per_sec": round(len(latencies) / wall, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "graph_runs": server.agent.processor.graph_runner.runs,
+        "batching": server.nlu_batcher.stats() if server.nlu_batcher else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--senders", type=int, default=200, help="concurrent conversations")
+    parser.add_argument("--messages", type=int, default=5, help="messages per conversation")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--wait-ms", type=float, default=10.0)
+    add_cost_arguments(parser)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+    resolve_costs(args)
+
+    results = [
+        asyncio.run(run_mode("per-message", 1, args)),
+        asyncio.run(run_mode("batched", args.batch_size, args)),
+    ]
+
+    print(f"{'mode':<13}{'msg/sec':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'graph runs':>12}")
+    for r in results:
+        print(f"{r['mode']:<13}{r['throughput_msg_per_sec']:>10}{r['p50_ms']:>10}"
+              f"{r['p95_ms']:>10}{r['p99_ms']:>10}{r['graph_runs']:>12}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
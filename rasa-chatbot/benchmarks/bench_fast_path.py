@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Accuracy parity and CPU saved by the pre-NLU fast path.
+
+Loads the fast path (models/fast_path.json, or builds it from data/ when there
+is none) and the trained model. It then runs every NLU example, plus casing
+and punctuation variants of the greet/goodbye/bot_challenge examples, through
+both:
+
+* parity: for each message the fast path answers, whether the full model
+  predicts the same intent (any disagreement is listed);
+* CPU: process time per message for `FastPath.respond` and for the full
+  `agent.handle_text` (NLU, policies and tracker), measured on the messages
+  the fast path answers, i.e. the CPU each fast-path hit saves.
+
+The saving for a traffic mix is projected from `--trivial-share`, the share of
+messages that are greetings, goodbyes or bot challenges. Without Rasa or a
+trained model, only the fast path's own cost and coverage are reported.
+
+    python benchmarks/bench_fast_path.py --model models/latest.tar.gz --trivial-share 0.4
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fast_path import (  # noqa: E402
+    FAST_PATH_FILE, FAST_PATH_INTENTS, FastPath, build_fast_path, check_parity, load_examples, parity_texts,
+)
+
+BOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def cpu_ms_per_message(handle: Callable[[Text], Any], texts: List[Text], repeat: int) -> float:
+    started = time.process_time()
+    for _ in range(repeat):
+        for text in texts:
+            handle(text)
+    return (time.process_time() - started) / (repeat * len(texts)) * 1000
+
+
+async def full_model_cpu_ms(agent: Any, texts: List[Text], repeat: int) -> float:
+    """CPU per message through the whole agent, each message on a fresh conversation"""
+    started = time.process_time()
+    for r in range(repeat):
+        for i, text in enumerate(texts):
+            await agent.handle_text(text, sender_id=f"bench-{r}-{i}")
+    return (time.process_time() - started) / (repeat * len(texts)) * 1000
+
+
+def load_agent(model: Optional[Text]):
+    try:
+        from rasa.core.agent import Agent
+    except ImportError:
+        print("Rasa is not installed; skipping the full-model comparison")
+        return None
+    if not model:
+        models = glob.glob(os.path.join(BOT_DIR, "models", "*.tar.gz"))
+        model = max(models, key=os.path.getmtime) if models else None
+    if not model:
+        print("No trained model in models/; skipping the full-model comparison")
+        return None
+    print(f"Loading {model}...")
+    return Agent.load(model)
+
+
+async def run(args) -> Dict[Text, Any]:
+    artifact_path = args.artifact or os.path.join(BOT_DIR, "models", FAST_PATH_FILE)
+    if os.path.exists(artifact_path):
+        fast_path = FastPath.load(artifact_path, args.threshold)
+    else:
+        print(f"{artifact_path} not found; building the fast path from data/")
+        fast_path = FastPath(build_fast_path(BOT_DIR), args.threshold)
+
+    texts = parity_texts(BOT_DIR)
+    answered = [t for t in texts if fast_path.classify(t)[0] is not None]
+    trivial = [t for intent in FAST_PATH_INTENTS for t in load_examples(BOT_DIR).get(intent, [])]
+    result: Dict[Text, Any] = {
+        "messages": len(texts),
+        "answered": len(answered),
+        "trivial_coverage": round(sum(fast_path.classify(t)[0] is not None for t in trivial) / len(trivial), 4)
+        if trivial else 0.0,
+        "fast_path_cpu_ms": round(cpu_ms_per_message(lambda t: fast_path.respond(t, "bench"), answered or texts,
+                                                     args.repeat * 10), 4),
+    }
+
+    agent = load_agent(args.model)
+    if agent is not None:
+        parity = await check_parity(fast_path, agent.parse_message, texts)
+        # Warm-up, so lazy initialisation isn't counted
+        await agent.handle_text("hello", sender_id="bench-warmup")
+        full_ms = await full_model_cpu_ms(agent, answered, args.repeat) if answered else 0.0
+        saved_ms = full_ms - result["fast_path_cpu_ms"]
+        result.update({
+            "agreement": parity["agreement"],
+            "disagreements": parity["disagreements"],
+            "full_model_cpu_ms": round(full_ms, 3),
+            "saved_cpu_ms_per_hit": round(saved_ms, 3),
+            "saved_cpu_ms_per_message": round(args.trivial_share * result["trivial_coverage"] * saved_ms, 3),
+        })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", help="trained model (default: newest in models/)")
+    parser.add_argument("--artifact", help=f"fast path artifact (default: models/{FAST_PATH_FILE})")
+    parser.add_argument("--threshold", type=float, help="override the artifact's confidence threshold")
+    parser.add_argument("--repeat", type=int, default=3, help="passes over the messages for the CPU timings")
+    parser.add_argument("--trivial-share", type=float, default=0.4,
+                        help="share of traffic that is greetings, goodbyes and bot challenges")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    r = asyncio.run(run(args))
+    print(f"\nFast path answers {r['answered']}/{r['messages']} check messages "
+          f"({r['trivial_coverage']:.0%} of the trivial-intent examples)")
+    print(f"{'fast path CPU ms/msg':>24}{r['fast_path_cpu_ms']:>10.4f}")
+    if "agreement" in r:
+        print(f"{'full model CPU ms/msg':>24}{r['full_model_cpu_ms']:>10.3f}")
+        print(f"{'saved CPU ms per hit':>24}{r['saved_cpu_ms_per_hit']:>10.3f}")
+        print(f"{'saved CPU ms per msg':>24}{r['saved_cpu_ms_per_message']:>10.3f}"
+              f"  (at {args.trivial_share:.0%} trivial traffic)")
+        print(f"{'agreement with model':>24}{r['agreement']:>10.1%}")
+        for d in r["disagreements"]:
+            print(f"   • {d['text']!r}: fast path {d['fast_path']} ({d['confidence']}), model {d['full_model']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(r, f, indent=2)
+    # Non-zero exit when the fast path disagrees with the model, for use in CI
+    return 1 if r.get("disagreements") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Lookup cost of the knowledge alias index as the number of entries grows.
+
+Builds synthetic categories of N clubs/locations (three aliases each) and
+times slot-value lookups (exact, misspelt and unknown values) through
+`KnowledgeCategory.lookup`, next to the substring if-chain the actions used
+before, which tests every alias in turn.
+
+"cold" clears the index's remembered typo corrections before every lookup,
+so each misspelt word is corrected from scratch; this is the cost of a slot
+value the server hasn't seen yet. "warm" times the same lookups with the
+corrections remembered from the earlier passes.
+
+    python benchmarks/bench_knowledge.py --sizes 6 25 50 100 200
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List, Text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from knowledge import KnowledgeCategory  # noqa: E402
+
+SYLLABLES = ["ka", "ro", "mi", "ta", "ven", "dor", "li", "sa", "pra", "nu", "tech", "art", "gra", "zo", "bel", "quin"]
+KINDS = ["club", "society", "cell", "block", "hall", "team", "forum", "circle"]
+
+
+def synthetic_category(size: int, rng: random.Random) -> Dict[Text, Any]:
+    entries, seen = [], set()
+    while len(entries) < size:
+        word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        if word in seen:
+            continue
+        seen.add(word)
+        kind = rng.choice(KINDS)
+        entries.append({
+            "id": word,
+            "name": f"{word} {kind}",
+            "aliases": [word, f"the {word} {kind}", f"{word[:3]} {kind}"],
+            "response": f"About {word}.",
+        })
+    return {"overview": "overview", "unknown": "unknown", "entries": entries}
+
+
+def misspell(word: Text, rng: random.Random) -> Text:
+    i = rng.randrange(len(word))
+    return word[:i] + word[i + 1:] if len(word) > 4 else word
+
+
+def make_queries(category: Dict[Text, Any], count: int, rng: random.Random) -> List[Text]:
+    queries = []
+    for i in range(count):
+        entry = rng.choice(category["entries"])
+        kind = i % 3
+        if kind == 0:
+            queries.append(f"tell me about {entry['name']}")
+        elif kind == 1:
+            queries.append(misspell(entry["id"], rng))
+        else:
+            queries.append("something we have never heard of")
+    return queries
+
+
+def if_chain_lookup(entries: List[Dict[Text, Any]], value: Text):
+    """The old approach: test each alias as a substring, in order."""
+    value = value.lower()
+    for entry in entries:
+        for alias in [entry["name"]] + entry["aliases"]:
+            if alias.lower() in value:
+                return entry
+    return None
+
+
+def cold_lookup(category: KnowledgeCategory):
+    def lookup(value: Text):
+        category.index.clear_corrections()
+        return category.lookup(value)
+    return lookup
+
+
+def time_per_lookup(fn, queries: List[Text], repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for q in queries:
+            fn(q)
+    return (time.perf_counter() - started) / (repeat * len(queries)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[6, 25, 50, 100, 200])
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    print(f"{'entries':>8}{'cold us/lookup':>16}{'warm us/lookup':>16}{'if-chain us/lookup':>21}{'build ms':>10}")
+    for size in args.sizes:
+        data = synthetic_category(size, rng)
+        started = time.perf_counter()
+        category = KnowledgeCategory("bench", data)
+        build_ms = (time.perf_counter() - started) * 1000
+        queries = make_queries(data, args.queries, rng)
+        cold_us = time_per_lookup(cold_lookup(category), queries, args.repeat)
+        # Every correction is remembered after the cold passes
+        warm_us = time_per_lookup(category.lookup, queries, args.repeat)
+        chain_us = time_per_lookup(lambda q: if_chain_lookup(data["entries"], q), queries, args.repeat)
+        print(f"{size:>8}{cold_us:>16.2f}{warm_us:>16.2f}{chain_us:>21.2f}{build_ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
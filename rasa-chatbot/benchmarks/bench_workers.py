@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Throughput of the pre-fork serving mode as the number of workers grows.
+
+For each worker count, starts a `WorkerPool` on one port whose workers run a
+CPU-bound `StubAgent` (it spins a core for the configured NLU and policy time,
+like TensorFlow inference would) and drives POST /webhook with the load
+test's conversation mix for a fixed duration. The workers open shared SQLite
+stores in a temporary directory, although the stub agent keeps no trackers in
+them. Prints throughput, latency percentiles and the speedup over one worker;
+scaling should stay close to linear up to the number of free cores.
+
+    python benchmarks/bench_workers.py --workers 1 2 4 --concurrency 64 --duration 10
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Text
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.loadtest import run_transport  # noqa: E402
+from benchmarks.stubs import StubAgent, add_cost_arguments, resolve_costs  # noqa: E402
+from workers import WorkerPool  # noqa: E402
+
+READY_TIMEOUT = 60.0
+
+
+async def wait_for_workers(url: Text, workers: int):
+    """Poll /health on fresh connections until every worker has answered"""
+    seen = set()
+    deadline = time.perf_counter() + READY_TIMEOUT
+    connector = aiohttp.TCPConnector(force_close=True)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        while len(seen) < workers:
+            if time.perf_counter() > deadline:
+                raise RuntimeError(f"only workers {sorted(seen)} became ready within {READY_TIMEOUT:.0f}s")
+            try:
+                async with session.get(f"{url}/health") as r:
+                    health = await r.json()
+                    if health.get("status") == "healthy":
+                        seen.add(health.get("worker"))
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.05)
+
+
+def run_pool(workers: int, args, db_dir: Text) -> Dict[Text, Any]:
+    settings = {
+        "max_in_flight": args.concurrency,
+        "tracker_store": "sqlite",
+        "lock_store": "sqlite",
+        "store_db": os.path.join(db_dir, f"conversations-{workers}.db"),
+        "nlu_batch_size": args.batch_size,
+        "response_cache_size": 0,
+        "model_watch_interval": 0,
+    }
+    agent_factory = functools.partial(StubAgent, args.graph_overhead_ms, args.per_message_ms, args.policy_ms,
+                                      cpu_bound=True)
+    pool = WorkerPool(workers, "127.0.0.1", args.port, settings, agent_factory)
+    url = f"http://127.0.0.1:{args.port}"
+    load = argparse.Namespace(concurrency=args.concurrency, messages=sys.maxsize, duration=args.duration,
+                              api_share=0.0, think_ms=0.0, seed=42, no_stream=False)
+    pool.start()
+    try:
+        asyncio.run(wait_for_workers(url, workers))
+        result = asyncio.run(run_transport("http", url, load))
+    finally:
+        pool.stop()
+    return dict(result, workers=workers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    default_workers = sorted({1, 2, 4, cores} & set(range(1, cores + 1)))
+    parser.add_argument("--workers", type=int, nargs="+", default=default_workers)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load per worker count")
+    parser.add_argument("--port", type=int, default=5107)
+    parser.add_argument("--batch-size", type=int, default=1, help="NLU batch size (1 = per-message parsing)")
+    add_cost_arguments(parser)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+    resolve_costs(args)
+
+    if max(args.workers) > cores:
+        print(f"⚠️  Only {cores} cores available; counts above that cannot scale")
+
+    results: List[Dict[Text, Any]] = []
+    with tempfile.TemporaryDirectory() as db_dir:
+        for workers in args.workers:
+            results.append(run_pool(workers, args, db_dir))
+
+    base = results[0]["throughput_msg_per_sec"] / results[0]["workers"]
+    print(f"{'workers':>8}{'msg/s':>9}{'speedup':>9}{'efficiency':>12}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for r in results:
+        speedup = r["throughput_msg_per_sec"] / base if base else 0.0
+        r["speedup"] = round(speedup, 2)
+        r["efficiency"] = round(speedup / r["workers"], 2)
+        print(f"{r['workers']:>8}{r['throughput_msg_per_sec']:>9.1f}{speedup:>9.2f}{r['efficiency']:>12.0%}"
+              f"{r['p50_ms'] or 0:>9.1f}{r['p95_ms'] or 0:>9.1f}{r['p99_ms'] or 0:>9.1f}"
+              f"{r['errors'] + r['rejected']:>8}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"cores": cores, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
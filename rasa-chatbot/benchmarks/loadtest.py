@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test of the chatbot server over its real transports.
+
+Replays a mix of conversations built from data/stories.yml (each story's
+intents, with example texts drawn from data/nlu.yml) plus a share of
+Node-backed turns (`/events_now`, `/my_profile`, ...) against POST /webhook
+and the Socket.IO `user_message` event, at a fixed number of concurrent
+virtual users. Each webhook conversation uses its own sender id and each
+Socket.IO conversation its own connection, like real chats. With streamed
+Socket.IO replies, latency runs to `bot_message_end` and the time to the
+first `bot_message` chunk is reported separately.
+
+Unless --url is given, the server is started in a child process with a
+`StubAgent` and next to a stand-in for the Node `/api` endpoints, so the
+whole run is offline and repeatable. Results (throughput, p50/p95/p99,
+rejected and failed messages per transport) are printed and written as JSON;
+--compare checks them against an earlier run and exits non-zero when a
+transport got slower than --tolerance allows.
+
+    python benchmarks/loadtest.py --concurrency 50 --messages 2000 --out results.json
+    python benchmarks/loadtest.py --concurrency 50 --messages 2000 --compare results.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Text
+
+import aiohttp
+import socketio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stubs import NODE_ACTIONS, add_cost_arguments, resolve_costs  # noqa: E402
+from fast_path import BOT_DIR, load_examples, load_yaml  # noqa: E402
+
+REPLY_TIMEOUT = 30.0
+READY_TIMEOUT = 60.0
+# Higher is better for these, lower for the rest
+HIGHER_IS_BETTER = {"throughput_msg_per_sec"}
+COMPARED = ["throughput_msg_per_sec", "p50_ms", "p95_ms", "p99_ms", "first_chunk_p95_ms"]
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+
+class ConversationMix:
+    """Draws conversations: story replays, or runs of Node-backed turns."""
+
+    def __init__(self, api_share: float, seed: int):
+        self.rng = random.Random(seed)
+        self.api_share = api_share
+        self.examples = load_examples()
+        self.stories = [
+            [step["intent"] for step in story.get("steps", []) if "intent" in step]
+            for story in load_yaml(os.path.join(BOT_DIR, "data", "stories.yml")).get("stories", [])
+        ]
+        self.stories = [s for s in self.stories if s and all(i in self.examples for i in s)]
+
+    def next(self) -> List[Text]:
+        if self.rng.random() < self.api_share:
+            intents = self.rng.sample(sorted(NODE_ACTIONS), self.rng.randint(1, 3))
+            return [f"/{intent}" for intent in intents]
+        story = self.rng.choice(self.stories)
+        return [self.rng.choice(self.examples[intent]) for intent in story]
+
+
+class TransportStats:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.first_chunk: List[float] = []
+        self.rejected = 0
+        self.errors = 0
+        self.conversations = 0
+
+    def summary(self, wall: float) -> Dict[Text, Any]:
+        latencies = sorted(self.latencies)
+        result = {
+            "messages": len(latencies) + self.rejected + self.errors,
+            "ok": len(latencies),
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "conversations": self.conversations,
+            "wall_s": round(wall, 2),
+            "throughput_msg_per_sec": round(len(latencies) / wall, 1) if wall else 0.0,
+        }
+        for name, p in (("p50_ms", 0.50), ("p95_ms", 0.95), ("p99_ms", 0.99)):
+            result[name] = round(percentile(latencies, p) * 1000, 2) if latencies else None
+        if self.first_chunk:
+            first_chunk = sorted(self.first_chunk)
+            result["first_chunk_p50_ms"] = round(percentile(first_chunk, 0.50) * 1000, 2)
+            result["first_chunk_p95_ms"] = round(percentile(first_chunk, 0.95) * 1000, 2)
+        return result
+
+
+async def webhook_conversation(session: aiohttp.ClientSession, url: Text, sender: Text,
+                               messages: List[Text], stats: TransportStats, think: float):
+    for text in messages:
+        started = time.perf_counter()
+        try:
+            async with session.post(f"{url}/webhook", json={"message": text, "user_id": sender}) as r:
+                await r.read()
+                status = r.status
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            status = None
+        if status == 200:
+            stats.latencies.append(time.perf_counter() - started)
+        elif status in (429, 503):
+            stats.rejected += 1
+        else:
+            stats.errors += 1
+        if think:
+            await asyncio.sleep(think)
+
+
+async def socketio_conversation(url: Text, messages: List[Text], stats: TransportStats, think: float,
+                                stream: bool = True):
+    client = socketio.AsyncClient(reconnection=False)
+    replies: asyncio.Queue = asyncio.Queue()
+    client.on("bot_message", lambda data: replies.put_nowait("chunk"))
+    client.on("bot_message_end", lambda data: replies.put_nowait("end"))
+    try:
+        await client.connect(url, transports=["websocket"])
+    except socketio.exceptions.ConnectionError:
+        stats.errors += len(messages)
+        return
+    try:
+        for text in messages:
+            started = time.perf_counter()
+            await client.emit("user_message", {"message": text})
+            try:
+                await asyncio.wait_for(replies.get(), REPLY_TIMEOUT)
+                if stream:
+                    stats.first_chunk.append(time.perf_counter() - started)
+                    while await asyncio.wait_for(replies.get(), REPLY_TIMEOUT) != "end":
+                        pass
+            except asyncio.TimeoutError:
+                stats.errors += 1
+                continue
+            stats.latencies.append(time.perf_counter() - started)
+            if think:
+                await asyncio.sleep(think)
+    finally:
+        await client.disconnect()
+
+
+async def run_transport(transport: Text, url: Text, args) -> Dict[Text, Any]:
+    mix = ConversationMix(args.api_share, args.seed)
+    stats = TransportStats()
+    budget = {"messages": args.messages}
+    deadline = time.perf_counter() + args.duration if args.duration else None
+    think = args.think_ms / 1000
+
+    async with aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=args.concurrency),
+        timeout=aiohttp.ClientTimeout(total=REPLY_TIMEOUT),
+    ) as session:
+
+        async def user(n: int):
+            conversation = 0
+            while budget["messages"] > 0 and (deadline is None or time.perf_counter() < deadline):
+                messages = mix.next()[:budget["messages"]]
+                budget["messages"] -= len(messages)
+                stats.conversations += 1
+                conversation += 1
+                if transport == "http":
+                    await webhook_conversation(session, url, f"loadtest-{n}-{conversation}", messages, stats, think)
+                else:
+                    await socketio_conversation(url, messages, stats, think, not args.no_stream)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user(n) for n in range(args.concurrency)))
+        wall = time.perf_counter() - started
+
+    return stats.summary(wall)
+
+
+def serve_stub(args):
+    """Child process: the chatbot server with a stub agent, plus the Node /api stand-in"""
+    from aiohttp import web
+
+    from benchmarks.stubs import StubAgent, build_node_api_app
+    from rasa_server import RasaChatbotServer
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    async def main():
+        node = web.AppRunner(build_node_api_app(args.node_latency_ms))
+        await node.setup()
+        await web.TCPSite(node, "127.0.0.1", args.node_port).start()
+
+        server = RasaChatbotServer(
+            max_in_flight=args.max_in_flight,
+            stream_responses=not args.no_stream,
+            nlu_batch_size=args.batch_size,
+            response_cache_size=args.cache_size,
+        )
+        server.agent = StubAgent(args.graph_overhead_ms, args.per_message_ms, args.policy_ms,
+                                 node_api_base=f"http://127.0.0.1:{args.node_port}/api")
+        server.prepare_agent(server.agent)
+        server.status = "healthy"
+        await server.start_server("127.0.0.1", args.port, load_model=False)
+
+    asyncio.run(main())
+
+
+async def wait_until_ready(url: Text):
+    deadline = time.perf_counter() + READY_TIMEOUT
+    async with aiohttp.ClientSession() as session:
+        while time.perf_counter() < deadline:
+            try:
+                async with session.get(f"{url}/health") as r:
+                    if r.status == 200 and (await r.json()).get("status") == "healthy":
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not become healthy within {READY_TIMEOUT:.0f}s")
+
+
+def format_ms(value: Optional[float]) -> Text:
+    """A latency for the summary table, or "-" when there were no samples"""
+    return f"{value:.1f}" if value is not None else "-"
+
+
+def compare(results: Dict[Text, Any], baseline_path: Text, tolerance: float) -> bool:
+    """Print the change against a previous run; False if any transport regressed"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    print(f"\nCompared with {baseline_path} ({baseline.get('started_at', '?')}), tolerance {tolerance:.0%}:")
+    passed = True
+    for transport, current in results["transports"].items():
+        previous = baseline.get("transports", {}).get(transport)
+        if not previous:
+            print(f"  {transport}: not in baseline")
+            continue
+        for metric in COMPARED:
+            old, new = previous.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            flag = "REGRESSION" if worse > tolerance else ""
+            passed = passed and not flag
+            print(f"  {transport:<10}{metric:<24}{old:>10}{new:>10}{change:>+9.1%}  {flag}")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transports", nargs="+", choices=["http", "socketio"], default=["http", "socketio"])
+    parser.add_argument("--concurrency", type=int, default=50, help="concurrent virtual users")
+    parser.add_argument("--messages", type=int, default=2000, help="messages per transport")
+    parser.add_argument("--duration", type=float, help="stop each transport after this many seconds")
+    parser.add_argument("--api-share", type=float, default=0.2, help="share of conversations hitting the Node API")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="pause between a reply and the next message")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-stream", action="store_true",
+                        help="Socket.IO replies are single messages (server runs with RASA_STREAM_RESPONSES=0)")
+    parser.add_argument("--url", help="test an already running server instead of a stub one")
+    parser.add_argument("--port", type=int, default=5105)
+    parser.add_argument("--node-port", type=int, default=5106)
+    parser.add_argument("--node-latency-ms", type=float, default=20.0)
+    add_cost_arguments(parser)
+    parser.add_argument("--max-in-flight", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--cache-size", type=int, default=1024)
+    parser.add_argument("--out", help="write results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare with the results of an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed regression (default: 0.10)")
+    args = parser.parse_args()
+    if not args.url:
+        resolve_costs(args)
+
+    url = args.url or f"http://127.0.0.1:{args.port}"
+    child: Optional[multiprocessing.Process] = None
+    if not args.url:
+        child = multiprocessing.get_context("spawn").Process(target=serve_stub, args=(args,), daemon=True)
+        child.start()
+
+    results = {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "target": args.url or "stub",
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        "transports": {},
+    }
+    try:
+        asyncio.run(wait_until_ready(url))
+        for transport in args.transports:
+            results["transports"][transport] = asyncio.run(run_transport(transport, url, args))
+    finally:
+        if child:
+            child.terminate()
+            child.join()
+
+    print(f"{'transport':<10}{'ok':>7}{'rejected':>10}{'errors':>8}{'msg/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for transport, r in results["transports"].items():
+        print(f"{transport:<10}{r['ok']:>7}{r['rejected']:>10}{r['errors']:>8}{r['throughput_msg_per_sec']:>9.1f}"
+              f"{format_ms(r['p50_ms']):>9}{format_ms(r['p95_ms']):>9}{format_ms(r['p99_ms']):>9}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.compare and not compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""
+Offline stand-ins used by the chatbot benchmarks.
+
+`StubAgent` looks like a loaded Rasa agent from the server's point of view
+(`handle_text`, `handle_message`, `processor.graph_runner`) but classifies
+intents from the examples in data/nlu.yml and answers with the domain
+responses, spending a configurable amount of time per graph run, per message
+and per policy step instead of running TensorFlow. The default costs are only
+a rough DIET-like shape, with per-message inference dominating the graph
+overhead. `--calibrate MODEL` (see `add_cost_arguments`) measures them on a
+trained model instead.
+
+`build_node_api_app` is a stand-in for the Node `/api` endpoints. When the
+stub agent is given its URL, the Node-backed intents from rasa/rules.yml
+(sent as `/events_now`, `/my_profile`, ...) make a real HTTP call to it, the
+way the custom actions would.
+"""
+
+import asyncio
+import os
+import random
+import time
+from typing import Any, Dict, List, Optional, Text
+
+import aiohttp
+from aiohttp import web
+
+from fast_path import BOT_DIR, load_examples, load_yaml
+NLU_TARGET = "run_RegexMessageHandler"
+
+# Placeholder costs in ms; DIET predicts message by message, so per-message time dominates
+GRAPH_OVERHEAD_MS = 1.0
+PER_MESSAGE_MS = 8.0
+POLICY_MS = 2.0
+CALIBRATION_BATCH = 16
+
+
+def load_intent_actions() -> Dict[Text, List[Text]]:
+    """Intent -> actions that follow it in data/rules.yml and data/stories.yml."""
+    mapping: Dict[Text, List[Text]] = {}
+    for path, key in (("data/rules.yml", "rules"), ("data/stories.yml", "stories")):
+        for flow in load_yaml(os.path.join(BOT_DIR, path)).get(key, []):
+            intent = None
+            for step in flow.get("steps", []):
+                if "intent" in step:
+                    intent = step["intent"]
+                elif "action" in step and intent and intent not in mapping:
+                    mapping[intent] = [step["action"]]
+                    intent = None
+    return mapping
+
+
+def measure_costs(model_path: Text, repeat: int = 20, batch_size: int = CALIBRATION_BATCH) -> Dict[Text, float]:
+    """Graph overhead, per-message NLU and policy time of a trained model, in ms.
+
+    Times NLU graph runs over 1 and `batch_size` messages, then whole turns for
+    intents that rules and stories answer with `utter_*` responses only, so
+    the action server isn't needed.
+    """
+    from rasa.core.agent import Agent
+    from rasa.core.channels.channel import UserMessage
+    from nlu_batcher import parse_batch
+
+    agent = Agent.load(model_path)
+    actions = load_intent_actions()
+    examples = load_examples()
+    texts = [t for intent, ts in examples.items() for t in ts
+             if all(a.startswith("utter_") for a in actions.get(intent, ["?"]))]
+    rng = random.Random(0)
+
+    def graph_ms(n: int) -> float:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            parse_batch(agent, [UserMessage(rng.choice(texts)) for _ in range(n)])
+        return (time.perf_counter() - started) / repeat * 1000
+
+    async def turn_ms() -> float:
+        started = time.perf_counter()
+        for i in range(repeat):
+            await agent.handle_text(rng.choice(texts), sender_id=f"calibrate-{i}")
+        return (time.perf_counter() - started) / repeat * 1000
+
+    graph_ms(1)  # warm-up
+    single, batch = graph_ms(1), graph_ms(batch_size)
+    per_message = max(0.0, (batch - single) / (batch_size - 1))
+    return {
+        "graph_overhead_ms": round(max(0.0, single - per_message), 3),
+        "per_message_ms": round(per_message, 3),
+        "policy_ms": round(max(0.0, asyncio.run(turn_ms()) - single), 3),
+    }
+
+
+def add_cost_arguments(parser: Any):
+    parser.add_argument("--calibrate", metavar="MODEL", help="measure the stub costs on this trained model")
+    parser.add_argument("--graph-overhead-ms", type=float, default=GRAPH_OVERHEAD_MS)
+    parser.add_argument("--per-message-ms", type=float, default=PER_MESSAGE_MS)
+    parser.add_argument("--policy-ms", type=float, default=POLICY_MS)
+
+
+def resolve_costs(args: Any):
+    """Replace the stub cost arguments with measured ones when --calibrate is given"""
+    if getattr(args, "calibrate", None):
+        costs = measure_costs(args.calibrate)
+        print(f"Measured on {args.calibrate}: " + ", ".join(f"{k}={v}" for k, v in costs.items()))
+        vars(args).update(costs)
+
+
+# Intents answered by the Node-backed custom actions in rasa/, and the endpoint each one calls
+NODE_ACTIONS = {
+    "events_now": ("action_get_active_events", "/events/active"),
+    "polls_now": ("action_get_active_polls", "/polls"),
+    "my_profile": ("action_get_my_profile", "/me/profile"),
+    "my_ideas": ("action_get_my_ideas", "/me/ideas"),
+    "my_achievements": ("action_get_my_achievements", "/me/achievements"),
+}
+
+
+def build_node_api_app(latency_ms: float = 20.0, jitter_ms: float = 5.0) -> web.Application:
+    """Stand-in for the Node `/api` endpoints with small fixed payloads."""
+    payloads = {
+        "/api/events/active": [{"title": f"Event {i}", "startAt": "2024-01-01T10:00", "location": "U Block"} for i in range(5)],
+        "/api/polls": [{"title": f"Poll {i}", "options": [{"text": "Yes"}, {"text": "No"}]} for i in range(8)],
+        "/api/me/profile": {"user": {"name": "Student", "email": "student@vignan.ac.in", "branch": "CSE"}},
+        "/api/me/ideas": [{"data": {"title": f"Idea {i}", "status": "submitted"}} for i in range(8)],
+        "/api/me/achievements": [{"eventName": f"Hackathon {i}", "eventType": "Technical"} for i in range(8)],
+    }
+
+    async def handler(request: web.Request) -> web.Response:
+        await asyncio.sleep(max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000)
+        payload = payloads[request.path]
+        limit = int(request.query.get("limit") or 0)
+        if limit and isinstance(payload, list):
+            # Like the Node list routes, `?limit=` switches to `{ items, nextCursor }`
+            start = int(request.query.get("cursor") or 0)
+            end = start + limit
+            return web.json_response({"items": payload[start:end],
+                                      "nextCursor": str(end) if end < len(payload) else None})
+        return web.json_response(payload)
+
+    app = web.Application()
+    for path in payloads:
+        app.router.add_get(path, handler)
+    return app
+
+
+def _spend(ms: float, cpu_bound: bool = False):
+    """Block for `ms`: sleeping by default, or spinning a core to stand in for real inference."""
+    if ms <= 0:
+        return
+    if not cpu_bound:
+        time.sleep(ms / 1000)
+        return
+    deadline = time.perf_counter() + ms / 1000
+    while time.perf_counter() < deadline:
+        pass
+
+
+class StubParsedMessage:
+    def __init__(self, data: Dict[Text, Any]):
+        self.data = data
+
+    def as_dict(self, only_output_properties: bool = True) -> Dict[Text, Any]:
+        return dict(self.data)
+
+
+class StubClassifier:
+    """Exact match on training examples, then best word overlap."""
+
+    def __init__(self):
+        self.exact: Dict[Text, Text] = {}
+        self.vocab: Dict[Text, Dict[Text, int]] = {}
+        for intent, texts in load_examples().items():
+            for text in texts:
+                self.exact.setdefault(text.lower(), intent)
+                for word in text.lower().split():
+                    self.vocab.setdefault(word, {}).setdefault(intent, 0)
+                    self.vocab[word][intent] += 1
+
+    def classify(self, text: Text) -> Dict[Text, Any]:
+        if text.startswith("/"):
+            return {"name": text[1:], "confidence": 1.0}
+        normalized = text.lower().strip()
+        if normalized in self.exact:
+            return {"name": self.exact[normalized], "confidence": 0.99}
+        scores: Dict[Text, int] = {}
+        for word in normalized.split():
+            for intent, count in self.vocab.get(word, {}).items():
+                scores[intent] = scores.get(intent, 0) + count
+        if not scores:
+            return {"name": "nlu_fallback", "confidence": 0.3}
+        best = max(scores, key=scores.get)
+        return {"name": best, "confidence": round(scores[best] / sum(scores.values()), 3)}
+
+
+class StubGraphRunner:
+    def __init__(self, classifier: StubClassifier, overhead_ms: float, per_message_ms: float,
+                 cpu_bound: bool = False):
+        self.classifier = classifier
+        self.overhead_ms = overhead_ms
+        self.per_message_ms = per_message_ms
+        self.cpu_bound = cpu_bound
+        self.runs = 0
+
+    def run(self, inputs: Dict[Text, Any], targets: List[Text]) -> Dict[Text, Any]:
+        messages = inputs["__message__"]
+        self.runs += 1
+        _spend(self.overhead_ms + self.per_message_ms * len(messages), self.cpu_bound)
+        parsed = [
+            StubParsedMessage({"text": m.text, "intent": self.classifier.classify(m.text), "entities": []})
+            for m in messages
+        ]
+        return {targets[0]: parsed}
+
+
+class StubModelMetadata:
+    nlu_target = NLU_TARGET
+
+
+class StubAction:
+    def __init__(self, name: Text):
+        self._name = name
+
+    def name(self) -> Text:
+        return self._name
+
+
+class StubProcessor:
+    """Parse, predict and run-action steps, named like `MessageProcessor`'s so metrics can time them."""
+
+    def __init__(self, graph_runner: StubGraphRunner, policy_ms: float, node_api_base: Optional[Text]):
+        self.graph_runner = graph_runner
+        self.model_metadata = StubModelMetadata()
+        self.policy_ms = policy_ms
+        self.node_api_base = node_api_base
+        self._session: Optional[aiohttp.ClientSession] = None
+        domain = load_yaml(os.path.join(BOT_DIR, "domain.yml"))
+        self.responses = {name: variants[0]["text"] for name, variants in domain.get("responses", {}).items()}
+        self.intent_actions = load_intent_actions()
+
+    async def parse_message(self, message: Any) -> Dict[Text, Any]:
+        result = self.graph_runner.run({"__message__": [message]}, [NLU_TARGET])
+        return result[NLU_TARGET][0].as_dict()
+
+    def _check_for_unseen_features(self, parse_data: Dict[Text, Any]):
+        pass
+
+    def predict_next_with_tracker_if_should(self, parse_data: Dict[Text, Any]):
+        # Like the real agent, policy prediction blocks the event loop
+        _spend(self.policy_ms, self.graph_runner.cpu_bound)
+        intent = parse_data["intent"]["name"]
+        if intent in NODE_ACTIONS and self.node_api_base:
+            return StubAction(NODE_ACTIONS[intent][0]), None
+        return StubAction(self.intent_actions.get(intent, ["utter_help"])[0]), None
+
+    async def _run_action(self, action: StubAction, sender_id: Text) -> List[Dict[Text, Any]]:
+        name = action.name()
+        if name.startswith("utter_"):
+            return [{"recipient_id": sender_id, "text": self.responses.get(name, f"[{name}]")}]
+        path = next(path for action_name, path in NODE_ACTIONS.values() if action_name == name)
+        if self._session is None:
+            self._session = aiohttp.ClientSession()
+        async with self._session.get(f"{self.node_api_base}{path}") as r:
+            items = await r.json()
+        return [{"recipient_id": sender_id, "text": f"Found {len(items)} item(s)."}]
+
+
+class StubTrackerStore:
+    """Keeps no conversation history, so nothing is ever eligible for the response cache."""
+
+    async def retrieve(self, sender_id: Text) -> None:
+        return None
+
+
+class StubAgent:
+    """Pretend agent with a tunable cost model, for benchmarking the server offline."""
+
+    def __init__(self, graph_overhead_ms: float = GRAPH_OVERHEAD_MS, per_message_ms: float = PER_MESSAGE_MS,
+                 policy_ms: float = POLICY_MS, model_id: Text = "stub-model",
+                 node_api_base: Optional[Text] = None, cpu_bound: bool = False):
+        self.model_id = model_id
+        graph_runner = StubGraphRunner(StubClassifier(), graph_overhead_ms, per_message_ms, cpu_bound)
+        self.processor = StubProcessor(graph_runner, policy_ms, node_api_base)
+        self.tracker_store = StubTrackerStore()
+
+    def is_ready(self) -> bool:
+        return True
+
+    async def _respond(self, parse_data: Dict[Text, Any], sender_id: Text,
+                       output_channel: Any = None) -> List[Dict[Text, Any]]:
+        action, _ = self.processor.predict_next_with_tracker_if_should(parse_data)
+        messages = await self.processor._run_action(action, sender_id)
+        if output_channel is None:
+            return messages
+        # Like the real processor, hand each bot message to the output channel
+        for message in messages:
+            await output_channel.send_response(sender_id, {"text": message["text"]})
+        return output_channel.messages
+
+    async def handle_text(self, text: Text, output_channel: Any = None,
+                          sender_id: Text = "default") -> List[Dict[Text, Any]]:
+        return await self._respond(await self.processor.parse_message(_Text(text)), sender_id, output_channel)
+
+    async def handle_message(self, message: Any) -> Optional[List[Dict[Text, Any]]]:
+        parse_data = message.parse_data or await self.processor.parse_message(message)
+        return await self._respond(parse_data, message.sender_id, message.output_channel)
+
+    async def parse_message(self, text: Text) -> Dict[Text, Any]:
+        return await self.processor.parse_message(_Text(text))
+
+
+class _Text:
+    def __init__(self, text: Text):
+        self.text = text
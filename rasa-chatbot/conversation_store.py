@@ -0,0 +1,172 @@
+"""
+Conversation state for the Rasa chatbot server.
+
+Trackers and conversation locks are kept behind Rasa's own TrackerStore and
+LockStore interfaces so the server can run with bounded in-memory state on a
+single process, or share state between worker processes through a local
+SQLite file (one machine) or Redis (several machines).
+"""
+
+import asyncio
+import copy
+import json
+import os
+import sqlite3
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Text
+from urllib.parse import urlparse
+
+from rasa.core.lock import TicketLock
+from rasa.core.lock_store import InMemoryLockStore, LockStore, RedisLockStore, LOCK_LIFETIME
+from rasa.core.tracker_store import InMemoryTrackerStore, RedisTrackerStore, SQLTrackerStore, TrackerStore
+from rasa.shared.core.domain import Domain
+from rasa.shared.core.trackers import DialogueStateTracker
+
+DEFAULT_MAX_CONVERSATIONS = 10000
+DEFAULT_DB_PATH = "conversations.db"
+DEFAULT_REDIS_URL = "redis://localhost:6379/0"
+
+
+class LRUTrackerStore(InMemoryTrackerStore):
+    """In-memory tracker store that forgets the least recently active conversations."""
+
+    def __init__(self, domain: Domain, max_conversations: int = DEFAULT_MAX_CONVERSATIONS, **kwargs):
+        super().__init__(domain, **kwargs)
+        self.store = OrderedDict(self.store)
+        self.max_conversations = max_conversations
+
+    async def save(self, tracker: DialogueStateTracker) -> None:
+        await super().save(tracker)
+        self.store.move_to_end(tracker.sender_id)
+        while len(self.store) > self.max_conversations:
+            self.store.popitem(last=False)
+
+    async def retrieve(self, sender_id: Text) -> Optional[DialogueStateTracker]:
+        if sender_id in self.store:
+            self.store.move_to_end(sender_id)
+        return await super().retrieve(sender_id)
+
+
+class SQLiteLockStore(LockStore):
+    """Ticket lock store in a local SQLite file, shared by processes on one machine.
+
+    Issuing and returning tickets are read-modify-write operations, so both run
+    inside an immediate transaction to keep workers from interleaving them.
+    """
+
+    def __init__(self, db_path: Text = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversation_locks (conversation_id TEXT PRIMARY KEY, lock TEXT NOT NULL)"
+        )
+        super().__init__()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def get_lock(self, conversation_id: Text) -> Optional[TicketLock]:
+        row = self._conn.execute(
+            "SELECT lock FROM conversation_locks WHERE conversation_id = ?", (conversation_id,)
+        ).fetchone()
+        return TicketLock.from_dict(json.loads(row[0])) if row else None
+
+    def delete_lock(self, conversation_id: Text) -> None:
+        self._conn.execute("DELETE FROM conversation_locks WHERE conversation_id = ?", (conversation_id,))
+
+    def save_lock(self, lock: TicketLock) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO conversation_locks (conversation_id, lock) VALUES (?, ?)",
+            (lock.conversation_id, lock.dumps()),
+        )
+
+    def issue_ticket(self, conversation_id: Text, lock_lifetime: float = LOCK_LIFETIME) -> int:
+        with self._transaction():
+            return super().issue_ticket(conversation_id, lock_lifetime)
+
+    def cleanup(self, conversation_id: Text, ticket_number: int) -> None:
+        with self._transaction():
+            super().cleanup(conversation_id, ticket_number)
+
+
+def redis_settings(url: Text) -> Dict[Text, Any]:
+    """Host, port, db and password from a redis:// URL, as Rasa's Redis stores take them."""
+    parsed = urlparse(url or DEFAULT_REDIS_URL)
+    return {
+        "host": parsed.hostname or "localhost",
+        "port": parsed.port or 6379,
+        "db": int(parsed.path.lstrip("/") or 0),
+        "password": parsed.password,
+    }
+
+
+def create_tracker_store(kind: Text = "memory", db_path: Text = DEFAULT_DB_PATH,
+                         max_conversations: int = DEFAULT_MAX_CONVERSATIONS,
+                         redis_url: Text = DEFAULT_REDIS_URL) -> TrackerStore:
+    """Build the tracker store named by `kind` ('memory', 'sqlite' or 'redis')."""
+    if kind == "sqlite":
+        return SQLTrackerStore(Domain.empty(), dialect="sqlite", db=os.path.abspath(db_path))
+    if kind == "redis":
+        return RedisTrackerStore(Domain.empty(), **redis_settings(redis_url))
+    if kind == "memory":
+        return LRUTrackerStore(Domain.empty(), max_conversations=max_conversations)
+    raise ValueError(f"Unknown tracker store '{kind}', expected 'memory', 'sqlite' or 'redis'")
+
+
+def agent_view(store: TrackerStore) -> TrackerStore:
+    """A store for one agent: the same conversations as `store`, with its own domain.
+
+    `Agent.load` assigns the new model's domain to the store it is given, and
+    stores deserialise trackers with that domain. Loading a model into a view
+    leaves the domain of the agent still serving untouched.
+    """
+    return copy.copy(store)
+
+
+def create_lock_store(kind: Text = "memory", db_path: Text = DEFAULT_DB_PATH,
+                      redis_url: Text = DEFAULT_REDIS_URL) -> LockStore:
+    """Build the lock store named by `kind` ('memory', 'sqlite' or 'redis')."""
+    if kind == "sqlite":
+        return SQLiteLockStore(os.path.abspath(db_path))
+    if kind == "redis":
+        return RedisLockStore(**redis_settings(redis_url))
+    if kind == "memory":
+        return InMemoryLockStore()
+    raise ValueError(f"Unknown lock store '{kind}', expected 'memory', 'sqlite' or 'redis'")
+
+
+class SenderLocks:
+    """Per-sender asyncio locks so each conversation is handled strictly in order.
+
+    A lock only exists while a sender has messages pending, so the table stays
+    bounded by the number of in-flight requests.
+    """
+
+    def __init__(self):
+        self._locks: Dict[Text, asyncio.Lock] = {}
+        self._pending: Dict[Text, int] = {}
+
+    def pending(self, sender_id: Text) -> int:
+        return self._pending.get(sender_id, 0)
+
+    @asynccontextmanager
+    async def hold(self, sender_id: Text) -> AsyncIterator[None]:
+        lock = self._locks.setdefault(sender_id, asyncio.Lock())
+        self._pending[sender_id] = self._pending.get(sender_id, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._pending[sender_id] -= 1
+            if not self._pending[sender_id]:
+                del self._pending[sender_id]
+                del self._locks[sender_id]
@@ -0,0 +1,310 @@
+"""
+Pre-NLU fast path for trivial messages ("hi", "bye", "are you a bot").
+
+Greetings, goodbyes and bot challenges are a large share of the traffic, and
+each one otherwise goes through DIET, both CountVectorsFeaturizers and
+TEDPolicy. At train time, `build_fast_path` turns data/nlu.yml into a small
+JSON artifact with two parts:
+
+* an exact lookup of the normalized training examples of the fast-path
+  intents, and
+* a multinomial logistic regression over word and character n-grams, trained
+  on every NLU example, whose classes are the fast-path intents plus "other".
+
+The server asks the fast path first. It only answers when the lookup matches,
+or when the model is confident, the message is short and most of its words are
+known. It then replies with one of the intent's domain responses, the same
+ones the rules in data/rules.yml send. Anything else falls through to the full
+model. Unlike cached replies, fast-path turns are not added to the tracker.
+
+`check_parity` compares the fast path's answers with the full model's
+intents, and train.py refuses to write an artifact that disagrees too often.
+The artifact records the model archive it was checked against, and the server
+only uses it together with that model.
+"""
+
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import unicodedata
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Text, Tuple
+
+import yaml
+
+BOT_DIR = os.path.dirname(os.path.abspath(__file__))
+FAST_PATH_FILE = "fast_path.json"
+FAST_PATH_INTENTS = ("greet", "goodbye", "bot_challenge")
+OTHER = "other"
+
+DEFAULT_THRESHOLD = 0.9
+# Share of a message's words that must have been seen in training
+MIN_KNOWN_WORDS = 0.5
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_ENTITY_MARKUP = re.compile(r"\[([^\]]+)\](\([^)]*\)|\{[^}]*\})")
+
+
+def tokenize(text: Text) -> List[Text]:
+    text = text.lower().replace("'", "")
+    if text.isascii():
+        return _TOKEN.findall(text)
+    # Letters, marks and digits of any script, so non-English messages keep their words
+    return "".join(c if unicodedata.category(c)[0] in "LMN" else " " for c in text).split()
+
+
+def normalize(text: Text) -> Text:
+    """Lowercase, drop apostrophes and punctuation, and collapse whitespace."""
+    return " ".join(tokenize(text))
+
+
+def features(tokens: List[Text]) -> List[Text]:
+    """Word unigrams and bigrams plus character trigrams of each word (for typos)."""
+    found = [f"w:{t}" for t in tokens]
+    found += [f"b:{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+    for token in tokens:
+        padded = f"<{token}>"
+        found += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    return found
+
+
+def load_yaml(path: Text) -> Dict[Text, Any]:
+    with open(path, encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
+
+def load_examples(bot_dir: Text = BOT_DIR) -> Dict[Text, List[Text]]:
+    """Intent -> example texts from data/nlu.yml, with entity markup removed."""
+    examples: Dict[Text, List[Text]] = {}
+    for block in load_yaml(os.path.join(bot_dir, "data", "nlu.yml")).get("nlu", []):
+        if "intent" not in block:
+            continue
+        for line in block.get("examples", "").splitlines():
+            line = line.strip()
+            if line.startswith("- "):
+                examples.setdefault(block["intent"], []).append(_ENTITY_MARKUP.sub(r"\1", line[2:]))
+    return examples
+
+
+def rule_responses(bot_dir: Text = BOT_DIR) -> Dict[Text, Text]:
+    """Intent -> the single `utter_*` response an unconditional rule answers it with."""
+    responses: Dict[Text, Set[Text]] = {}
+    for rule in load_yaml(os.path.join(bot_dir, "data", "rules.yml")).get("rules", []):
+        steps = rule.get("steps", [])
+        if rule.get("condition") or len(steps) != 2 or "intent" not in steps[0]:
+            continue
+        action = steps[1].get("action", "")
+        if action.startswith("utter_"):
+            responses.setdefault(steps[0]["intent"], set()).add(action)
+    return {intent: actions.pop() for intent, actions in responses.items() if len(actions) == 1}
+
+
+def train_classifier(samples: List[Tuple[List[Text], int]], classes: int, epochs: int = 60,
+                     learning_rate: float = 0.5, l2: float = 1e-4, seed: int = 42
+                     ) -> Tuple[Dict[Text, List[float]], List[float]]:
+    """Softmax regression over sparse binary features, trained with SGD."""
+    weights: Dict[Text, List[float]] = {}
+    bias = [0.0] * classes
+    rng = random.Random(seed)
+    samples = list(samples)
+    for epoch in range(epochs):
+        rng.shuffle(samples)
+        rate = learning_rate / (1 + epoch * 0.1)
+        for feats, label in samples:
+            probs = _softmax(_scores(weights, bias, feats))
+            for k in range(classes):
+                gradient = probs[k] - (1.0 if k == label else 0.0)
+                bias[k] -= rate * gradient
+                for f in feats:
+                    row = weights.setdefault(f, [0.0] * classes)
+                    row[k] -= rate * (gradient + l2 * row[k])
+    return weights, bias
+
+
+def _scores(weights: Dict[Text, List[float]], bias: List[float], feats: Iterable[Text]) -> List[float]:
+    scores = list(bias)
+    for f in feats:
+        row = weights.get(f)
+        if row is not None:
+            for k, w in enumerate(row):
+                scores[k] += w
+    return scores
+
+
+def _softmax(scores: List[float]) -> List[float]:
+    top = max(scores)
+    exps = [math.exp(s - top) for s in scores]
+    total = sum(exps)
+    return [e / total for e in exps]
+
+
+def build_fast_path(bot_dir: Text = BOT_DIR, intents: Iterable[Text] = FAST_PATH_INTENTS,
+                    threshold: float = DEFAULT_THRESHOLD) -> Dict[Text, Any]:
+    """Build the fast-path artifact from data/nlu.yml, data/rules.yml and domain.yml."""
+    examples = load_examples(bot_dir)
+    domain = load_yaml(os.path.join(bot_dir, "domain.yml"))
+    answers = rule_responses(bot_dir)
+    responses: Dict[Text, List[Dict[Text, Any]]] = {}
+    for intent in intents:
+        name = answers.get(intent)
+        # Conditional and channel-specific variants depend on state the fast path doesn't have
+        variants = [v for v in domain.get("responses", {}).get(name, [])
+                    if v.get("text") and not v.get("condition") and not v.get("channel")]
+        if examples.get(intent) and variants:
+            responses[intent] = variants
+    classes = sorted(responses) + [OTHER]
+
+    lookup: Dict[Text, Optional[Text]] = {}
+    samples = []
+    for intent, texts in sorted(examples.items()):
+        label = intent if intent in responses else OTHER
+        for text in texts:
+            key = normalize(text)
+            # A text that appears under two labels is left to the model (and the full NLU)
+            lookup[key] = label if lookup.get(key, label) == label else None
+            samples.append((features(tokenize(text)), classes.index(label)))
+    weights, bias = train_classifier(samples, len(classes))
+
+    fast_examples = [t for intent in responses for t in examples[intent]]
+    return {
+        "version": 1,
+        "fingerprint": data_fingerprint(bot_dir),
+        "intents": classes[:-1],
+        "classes": classes,
+        "threshold": threshold,
+        "max_tokens": max(len(tokenize(t)) for t in fast_examples) + 1 if fast_examples else 0,
+        "vocabulary": sorted({t for texts in examples.values() for text in texts for t in tokenize(text)}),
+        "lookup": {key: label for key, label in sorted(lookup.items()) if label and label != OTHER},
+        "responses": responses,
+        "weights": {f: [round(w, 5) for w in row] for f, row in sorted(weights.items())},
+        "bias": [round(b, 5) for b in bias],
+    }
+
+
+def data_fingerprint(bot_dir: Text = BOT_DIR) -> Text:
+    """Hash of the files the artifact is built from."""
+    digest = hashlib.sha256()
+    for path in ("data/nlu.yml", "data/rules.yml", "domain.yml"):
+        with open(os.path.join(bot_dir, path), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def write_fast_path(artifact: Dict[Text, Any], path: Text):
+    """Write the artifact atomically, since a running server may reload it at any time"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(artifact, f)
+    os.replace(tmp_path, path)
+
+
+class FastPath:
+    """Answers high-confidence trivial messages from the fast-path artifact."""
+
+    def __init__(self, artifact: Dict[Text, Any], threshold: Optional[float] = None):
+        self.classes: List[Text] = artifact["classes"]
+        self.intents: Set[Text] = set(artifact["intents"])
+        self.threshold = artifact["threshold"] if threshold is None else threshold
+        self.max_tokens: int = artifact["max_tokens"]
+        self.vocabulary: Set[Text] = set(artifact["vocabulary"])
+        self.lookup: Dict[Text, Text] = artifact["lookup"]
+        self.responses: Dict[Text, List[Dict[Text, Any]]] = artifact["responses"]
+        self.weights: Dict[Text, List[float]] = artifact["weights"]
+        self.bias: List[float] = artifact["bias"]
+        self.fingerprint: Text = artifact.get("fingerprint", "")
+        # File name of the model archive the artifact was checked against
+        self.model: Optional[Text] = artifact.get("model")
+        self.hits = 0
+        self.lookup_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def load(cls, path: Text, threshold: Optional[float] = None) -> "FastPath":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f), threshold)
+
+    def classify(self, text: Text) -> Tuple[Optional[Text], float]:
+        """(fast-path intent, confidence), or (None, confidence) when the message should fall through."""
+        tokens = tokenize(text)
+        if not tokens or len(tokens) > self.max_tokens:
+            return None, 0.0
+        intent = self.lookup.get(" ".join(tokens))
+        if intent is not None:
+            return intent, 1.0
+        if sum(t in self.vocabulary for t in tokens) < MIN_KNOWN_WORDS * len(tokens):
+            return None, 0.0
+        probs = _softmax(_scores(self.weights, self.bias, features(tokens)))
+        best = max(range(len(probs)), key=probs.__getitem__)
+        intent = self.classes[best]
+        if intent == OTHER or probs[best] < self.threshold:
+            return None, probs[best]
+        return intent, probs[best]
+
+    def respond(self, text: Text, sender_id: Text) -> Optional[Tuple[Text, List[Dict[Text, Any]]]]:
+        """(intent, bot messages) as the full model would send them, or None to fall through."""
+        intent, confidence = self.classify(text)
+        if intent is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if normalize(text) in self.lookup:
+            self.lookup_hits += 1
+        variant = random.choice(self.responses[intent])
+        # Like CollectingOutputChannel, one message per paragraph with extras on the last one
+        paragraphs = variant["text"].strip().split("\n\n")
+        messages: List[Dict[Text, Any]] = [{"recipient_id": sender_id, "text": p} for p in paragraphs]
+        for key in ("buttons", "image", "attachment", "custom"):
+            if variant.get(key):
+                messages[-1][key] = variant[key]
+        return intent, messages
+
+    def stats(self) -> Dict[Text, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "intents": sorted(self.intents),
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "lookup_hits": self.lookup_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def parity_texts(bot_dir: Text = BOT_DIR) -> List[Text]:
+    """Every NLU example plus casing and punctuation variants of the fast-path intents' examples."""
+    examples = load_examples(bot_dir)
+    texts = [t for intent in sorted(examples) for t in examples[intent]]
+    for intent in FAST_PATH_INTENTS:
+        for text in examples.get(intent, []):
+            texts += [text.upper(), text.capitalize() + "!", f"{text}?", f"{text} :)"]
+    return texts
+
+
+async def check_parity(fast_path: FastPath, parse: Callable[[Text], Awaitable[Dict[Text, Any]]],
+                       texts: List[Text]) -> Dict[Text, Any]:
+    """How often the fast path's answer matches the intent the full model predicts.
+
+    `parse` is the full model's NLU (e.g. `agent.parse_message`). Only messages
+    the fast path answers count; the rest reach the full model anyway.
+    """
+    answered = 0
+    disagreements = []
+    for text in texts:
+        intent, confidence = fast_path.classify(text)
+        if intent is None:
+            continue
+        answered += 1
+        full = ((await parse(text)).get("intent") or {}).get("name")
+        if full != intent:
+            disagreements.append({"text": text, "fast_path": intent, "confidence": round(confidence, 3),
+                                  "full_model": full})
+    return {
+        "messages": len(texts),
+        "answered": answered,
+        "coverage": round(answered / len(texts), 4) if texts else 0.0,
+        "agreement": round(1 - len(disagreements) / answered, 4) if answered else 1.0,
+        "disagreements": disagreements,
+    }
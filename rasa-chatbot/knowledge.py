@@ -0,0 +1,176 @@
+"""
+Knowledge store for the student body, vertical and campus spot actions.
+
+Entries and their aliases live in knowledge.yml and are loaded once when the
+action server starts. Aliases are compiled into a token trie, so resolving a
+slot value walks the trie from each of its words instead of testing every
+name in turn, and only whole words match ("pr" no longer matches inside
+"prakash"). That is O(words²) in the slot value, which is a few words long.
+Misspelt words are corrected against the alias vocabulary within a small edit
+distance. A deletion index limits the comparisons to vocabulary words that
+share a deletion with the input. That set still grows with the vocabulary, so
+a cold correction gets slower as entries are added, only much more slowly
+than testing every alias. Corrections are remembered, so a repeated slot value
+costs a dictionary lookup.
+"""
+
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional, Set, Text, Tuple
+
+import yaml
+
+KNOWLEDGE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "knowledge.yml")
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: Text) -> List[Text]:
+    return _TOKEN.findall(text.lower())
+
+
+def max_edits(token: Text) -> int:
+    """Allowed typos for a word: none for short words, one for medium, two for long."""
+    if len(token) <= 3:
+        return 0
+    return 1 if len(token) <= 7 else 2
+
+
+def _deletes(token: Text, distance: int) -> Set[Text]:
+    """Every string obtained by deleting up to `distance` characters from `token`."""
+    found = {token}
+    frontier = {token}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        found |= frontier
+    return found
+
+
+def edit_distance(a: Text, b: Text) -> int:
+    """Levenshtein distance with adjacent transpositions."""
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[len(b)]
+
+
+class AliasIndex:
+    """Token trie over aliases, with typo-tolerant word lookup."""
+
+    _END = "__entry__"
+
+    def __init__(self):
+        self._trie: Dict[Text, Any] = {}
+        self._vocab: Set[Text] = set()
+        self._deletes: Dict[Text, Set[Text]] = {}
+        # Slot values repeat a lot, so remember recent corrections
+        self._corrections: Dict[Text, Optional[Text]] = {}
+
+    def add(self, alias: Text, entry_id: Text):
+        tokens = tokenize(alias)
+        if not tokens:
+            return
+        node = self._trie
+        for token in tokens:
+            node = node.setdefault(token, {})
+            if token not in self._vocab:
+                self._vocab.add(token)
+                self.clear_corrections()
+                for deleted in _deletes(token, max_edits(token)):
+                    self._deletes.setdefault(deleted, set()).add(token)
+        node.setdefault(self._END, entry_id)
+
+    def clear_corrections(self):
+        """Forget remembered corrections, e.g. to time cold lookups."""
+        self._corrections.clear()
+
+    def correct(self, token: Text) -> Optional[Text]:
+        """The closest alias word within the allowed edit distance, if any."""
+        if token in self._vocab:
+            return token
+        if token in self._corrections:
+            return self._corrections[token]
+        limit = max_edits(token)
+        best: Optional[Tuple[int, Text]] = None
+        if limit:
+            candidates: Set[Text] = set()
+            for deleted in _deletes(token, limit):
+                candidates |= self._deletes.get(deleted, set())
+            for candidate in candidates:
+                if abs(len(candidate) - len(token)) > limit:
+                    continue
+                distance = edit_distance(token, candidate)
+                if distance <= min(limit, max_edits(candidate)) and (best is None or (distance, candidate) < best):
+                    best = (distance, candidate)
+        if len(self._corrections) >= 4096:
+            self._corrections.clear()
+        self._corrections[token] = best[1] if best else None
+        return self._corrections[token]
+
+    def find(self, text: Text) -> Optional[Text]:
+        """Entry id of the longest alias found in `text` (earliest wins a tie).
+
+        Walks the trie from every word of `text`, so O(words²) trie steps.
+        """
+        tokens = [self.correct(t) for t in tokenize(text)]
+        best: Optional[Tuple[int, int, Text]] = None
+        for start in range(len(tokens)):
+            node = self._trie
+            for end in range(start, len(tokens)):
+                node = node.get(tokens[end]) if tokens[end] else None
+                if node is None:
+                    break
+                if self._END in node:
+                    length = end - start + 1
+                    if best is None or length > best[0]:
+                        best = (length, start, node[self._END])
+        return best[2] if best else None
+
+
+class KnowledgeCategory:
+    """One slot's worth of entries (e.g. all student bodies) with its alias index."""
+
+    def __init__(self, name: Text, data: Dict[Text, Any]):
+        self.name = name
+        self.overview = data["overview"]
+        self.unknown = data["unknown"]
+        self.entries: Dict[Text, Dict[Text, Any]] = {}
+        self.index = AliasIndex()
+        for entry in data.get("entries", []):
+            self.entries[entry["id"]] = entry
+            for alias in [entry["name"]] + entry.get("aliases", []):
+                self.index.add(alias, entry["id"])
+
+    def lookup(self, value: Optional[Text]) -> Optional[Dict[Text, Any]]:
+        entry_id = self.index.find(value) if value else None
+        return self.entries.get(entry_id) if entry_id else None
+
+    def respond(self, value: Optional[Text]) -> Text:
+        """Answer for a slot value: the entry's response, the overview if empty, or the unknown hint."""
+        if not value:
+            return self.overview
+        entry = self.lookup(value)
+        return entry["response"] if entry else self.unknown
+
+
+class KnowledgeStore:
+    def __init__(self, data: Dict[Text, Any]):
+        self.categories = {name: KnowledgeCategory(name, body) for name, body in data.items()}
+
+    @classmethod
+    def load(cls, path: Text = KNOWLEDGE_FILE) -> "KnowledgeStore":
+        with open(path, encoding="utf-8") as f:
+            return cls(yaml.safe_load(f) or {})
+
+    def __getitem__(self, category: Text) -> KnowledgeCategory:
+        return self.categories[category]
+
+    def names(self) -> Iterable[Text]:
+        return self.categories.keys()
@@ -0,0 +1,229 @@
+"""
+Prometheus-style metrics and sampled request spans for the chatbot server.
+
+Counters, gauges and histograms live in process and are rendered in the
+Prometheus text format on GET /metrics, with no extra dependency. Every
+message gets a `Span`. The processor of each loaded agent is instrumented so
+NLU parsing, policy prediction and action execution (including calls to the
+action server) report their time to the span of the message they run for.
+Request, intent and action histograms are always updated; the per-stage
+breakdown is only recorded and logged for a sampled share of messages.
+"""
+
+import contextvars
+import functools
+import logging
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Text, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("chatbot_span", default=None)
+
+
+def _escape(value: Text) -> Text:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[Text], values: Sequence[Text], extra: Text = "") -> Text:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> Text:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: Text, documentation: Text, labels: Sequence[Text] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.values: Dict[Tuple[Text, ...], float] = {}
+
+    def inc(self, *labels: Text, amount: float = 1.0):
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def render(self) -> List[Text]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_labels(self.labels, labels)} {_number(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: Text, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: Text):
+        self.values[labels] = value
+
+
+class Histogram:
+    def __init__(self, name: Text, documentation: Text, labels: Sequence[Text] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self.values: Dict[Tuple[Text, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: Text):
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [0.0] * (len(self.buckets) + 2)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += 1
+        series[-1] += value
+
+    def render(self) -> List[Text]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self.values.items()):
+            for bound, count in zip(self.buckets, series):
+                bucket = _labels(self.labels, labels, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{bucket} {_number(count)}")
+            bucket = _labels(self.labels, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{bucket} {_number(series[-2])}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, labels)} {repr(series[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labels, labels)} {_number(series[-2])}")
+        return lines
+
+
+class Span:
+    """Timing of one message through the server, broken down by stage."""
+
+    __slots__ = ("transport", "sender_id", "started", "sampled", "intent", "stages", "actions", "token")
+
+    def __init__(self, transport: Text, sender_id: Text, sampled: bool):
+        self.transport = transport
+        self.sender_id = sender_id
+        self.started = time.perf_counter()
+        self.sampled = sampled
+        self.intent: Optional[Text] = None
+        self.stages: Dict[Text, float] = {}
+        self.actions: List[Tuple[Text, float]] = []
+        self.token = None
+
+    def add(self, stage: Text, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+
+class ServerMetrics:
+    """The chatbot server's metrics, plus span bookkeeping for each message."""
+
+    def __init__(self, trace_sample_rate: float = 0.01):
+        self.trace_sample_rate = trace_sample_rate
+        self.requests = Counter("chatbot_messages_total", "Messages handled, by transport and outcome",
+                                ["transport", "outcome"])
+        self.in_flight = Gauge("chatbot_messages_in_flight", "Messages currently being handled", ["transport"])
+        self.latency = Histogram("chatbot_message_seconds", "Time to answer a message", ["transport"])
+        self.intent_latency = Histogram("chatbot_intent_seconds", "Time to answer a message, by predicted intent",
+                                        ["intent"])
+        self.action_latency = Histogram("chatbot_action_seconds", "Time spent running each action", ["action"])
+        self.stage_latency = Histogram("chatbot_stage_seconds",
+                                       "Time per stage (nlu, policy, action) of sampled messages", ["stage"])
+        self.metrics = [self.requests, self.in_flight, self.latency, self.intent_latency,
+                        self.action_latency, self.stage_latency]
+
+    def reject(self, transport: Text):
+        self.requests.inc(transport, "rejected")
+
+    def start(self, transport: Text, sender_id: Text) -> Span:
+        span = Span(transport, sender_id, random.random() < self.trace_sample_rate)
+        span.token = _current_span.set(span)
+        self.in_flight.inc(transport)
+        return span
+
+    def finish(self, span: Span, outcome: Text):
+        elapsed = time.perf_counter() - span.started
+        _current_span.reset(span.token)
+        self.in_flight.dec(span.transport)
+        self.requests.inc(span.transport, outcome)
+        self.latency.observe(elapsed, span.transport)
+        if span.intent:
+            self.intent_latency.observe(elapsed, span.intent)
+        if span.sampled:
+            for stage, seconds in span.stages.items():
+                self.stage_latency.observe(seconds, stage)
+            stages = " ".join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in span.stages.items())
+            actions = ",".join(f"{name}:{seconds * 1000:.1f}ms" for name, seconds in span.actions)
+            logger.info("span transport=%s sender=%s outcome=%s intent=%s total=%.1fms %s actions=[%s]",
+                        span.transport, span.sender_id, outcome, span.intent, elapsed * 1000, stages, actions)
+
+    @staticmethod
+    def observe_parse(parse_data: Optional[Dict[Text, Any]], seconds: float):
+        """Credit an NLU parse done outside the processor (e.g. by the batcher) to the current span"""
+        span = _current_span.get()
+        if span is not None:
+            span.add("nlu", seconds)
+            if parse_data:
+                span.intent = (parse_data.get("intent") or {}).get("name")
+
+    def instrument(self, agent: Any):
+        """Wrap the agent's processor so its stages report to the current span (idempotent)"""
+        processor = getattr(agent, "processor", None)
+        if processor is None or getattr(processor, "_chatbot_metrics", False):
+            return
+        if hasattr(processor, "parse_message"):
+            processor.parse_message = self._timed_parse(processor.parse_message)
+        if hasattr(processor, "predict_next_with_tracker_if_should"):
+            processor.predict_next_with_tracker_if_should = self._timed_policy(
+                processor.predict_next_with_tracker_if_should)
+        if hasattr(processor, "_run_action"):
+            processor._run_action = self._timed_action(processor._run_action)
+        processor._chatbot_metrics = True
+
+    def _timed_parse(self, parse: Callable) -> Callable:
+        @functools.wraps(parse)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            result = await parse(*args, **kwargs)
+            self.observe_parse(result, time.perf_counter() - started)
+            return result
+        return wrapper
+
+    def _timed_policy(self, predict: Callable) -> Callable:
+        @functools.wraps(predict)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            result = predict(*args, **kwargs)
+            span = _current_span.get()
+            if span is not None:
+                span.add("policy", time.perf_counter() - started)
+            return result
+        return wrapper
+
+    def _timed_action(self, run_action: Callable) -> Callable:
+        @functools.wraps(run_action)
+        async def wrapper(*args, **kwargs):
+            action = args[0] if args else kwargs.get("action")
+            name = action.name() if callable(getattr(action, "name", None)) else str(action)
+            started = time.perf_counter()
+            try:
+                return await run_action(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                self.action_latency.observe(elapsed, name)
+                span = _current_span.get()
+                if span is not None:
+                    span.add("action", elapsed)
+                    span.actions.append((name, elapsed))
+        return wrapper
+
+    def render(self) -> Text:
+        lines: List[Text] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
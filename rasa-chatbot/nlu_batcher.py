@@ -0,0 +1,166 @@
+"""
+Micro-batched NLU inference for the Rasa chatbot server.
+
+Messages that arrive within a short window are parsed together in a single
+run of the NLU graph, then each caller gets its own parse result back and
+continues through the dialogue policies as usual. Inference runs on one
+dedicated thread so the event loop keeps accepting messages (and filling the
+next batch) while the current batch is being parsed.
+
+This is not vectorised inference. In Rasa 3.6, DIETClassifier (and the
+ResponseSelector built on it) still predicts one message at a time inside a
+graph run, so a batch only shares the per-run graph overhead, and every
+message in it is parsed one after another on the single inference thread.
+Batching is therefore off by default (`RASA_NLU_BATCH_SIZE=1`). It pays off only
+when the measured graph overhead is large compared with the per-message cost
+(see `benchmarks/bench_batching.py --calibrate`).
+
+Rasa's graph components are not documented as thread-safe, and the policies,
+`/intent` shortcuts and warm-up still run the same agent's graph on the event
+loop. `NLUBatcher.attach` therefore puts every graph run of an agent behind
+one lock, so a batch and a direct run never overlap; a direct run waits for
+the batch in progress.
+"""
+
+import asyncio
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Text, Tuple
+
+from rasa.core.channels.channel import UserMessage
+from rasa.engine.constants import PLACEHOLDER_MESSAGE, PLACEHOLDER_TRACKER
+from rasa.shared.constants import INTENT_MESSAGE_PREFIX
+from rasa.shared.nlu.constants import (
+    ENTITIES,
+    INTENT,
+    INTENT_NAME_KEY,
+    PREDICTED_CONFIDENCE_KEY,
+    TEXT,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def parse_batch(agent: Any, messages: List[UserMessage]) -> List[Dict[Text, Any]]:
+    """Run the agent's NLU graph once for a whole list of messages.
+
+    Mirrors `MessageProcessor.parse_message`, which does the same for a
+    single message.
+    """
+    processor = agent.processor
+    target = processor.model_metadata.nlu_target
+    results = processor.graph_runner.run(
+        inputs={PLACEHOLDER_MESSAGE: messages, PLACEHOLDER_TRACKER: None},
+        targets=[target],
+    )
+    parsed = []
+    for message in results[target]:
+        parse_data = {TEXT: "", INTENT: {INTENT_NAME_KEY: None, PREDICTED_CONFIDENCE_KEY: 0.0}, ENTITIES: []}
+        parse_data.update(message.as_dict(only_output_properties=True))
+        # Warns about intents and entities the domain doesn't know
+        processor._check_for_unseen_features(parse_data)
+        parsed.append(parse_data)
+    return parsed
+
+
+class NLUBatcher:
+    """Gathers messages for up to `max_wait_ms` or `max_batch_size` messages, then parses them together."""
+
+    def __init__(self, max_batch_size: int = 32, max_wait_ms: float = 10.0):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._pending: List[Tuple[Any, UserMessage, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nlu-batch")
+        # Held for every graph run of an attached agent, on either thread
+        self._graph_lock = threading.Lock()
+        self.batches = 0
+        self.messages = 0
+        self.max_batch_seen = 0
+
+    def attach(self, agent: Any):
+        """Serialise all graph runs of `agent` with the batches (idempotent).
+
+        Must be called before the agent handles any message.
+        """
+        runner = agent.processor.graph_runner
+        if getattr(runner, "_nlu_batcher_lock", None) is self._graph_lock:
+            return
+        run = runner.run
+
+        @functools.wraps(run)
+        def locked_run(*args, **kwargs):
+            with self._graph_lock:
+                return run(*args, **kwargs)
+
+        runner.run = locked_run
+        runner._nlu_batcher_lock = self._graph_lock
+
+    async def parse(self, agent: Any, text: Text) -> Optional[Dict[Text, Any]]:
+        """Parse `text` as part of the next batch.
+
+        Returns None for messages the batch path doesn't handle (e.g. `/intent`
+        shortcuts), which the agent then parses itself. `agent` must have been
+        passed to `attach`.
+        """
+        if text.startswith(INTENT_MESSAGE_PREFIX):
+            return None
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((agent, UserMessage(text), future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: List[Tuple[Any, UserMessage, asyncio.Future]]):
+        # A model swap can leave messages for two agents in one window
+        by_agent: Dict[int, List[Tuple[Any, UserMessage, asyncio.Future]]] = {}
+        for item in batch:
+            by_agent.setdefault(id(item[0]), []).append(item)
+
+        loop = asyncio.get_running_loop()
+        for items in by_agent.values():
+            agent = items[0][0]
+            started = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(
+                    self._executor, parse_batch, agent, [message for _, message, _ in items]
+                )
+            except Exception as e:
+                logger.error(f"Batched NLU parse failed: {e}")
+                for _, _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.messages += len(items)
+            self.max_batch_seen = max(self.max_batch_seen, len(items))
+            logger.debug(f"Parsed batch of {len(items)} in {(time.perf_counter() - started) * 1000:.1f} ms")
+            for (_, _, future), parse_data in zip(items, results):
+                if not future.done():
+                    future.set_result(parse_data)
+
+    def stats(self) -> Dict[Text, Any]:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "messages": self.messages,
+            "avg_batch_size": round(self.messages / self.batches, 2) if self.batches else 0.0,
+            "max_batch_seen": self.max_batch_seen,
+        }
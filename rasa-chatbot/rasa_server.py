@@ -5,82 +5,321 @@ Integrates with the Node.js backend via HTTP API
 """
 
 import asyncio
+import functools
+import glob
 import json
 import logging
-from typing import Dict, Any
+import os
+import time
+from typing import Dict, Any, List, Optional
 import aiohttp
 from aiohttp import web
 import socketio
 from rasa.core.agent import Agent
+from rasa.core.channels.channel import CollectingOutputChannel, UserMessage
 from rasa.core.utils import EndpointConfig
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+from conversation_store import (
+    DEFAULT_REDIS_URL, SenderLocks, agent_view, create_lock_store, create_tracker_store,
+)
+from fast_path import FAST_PATH_FILE, FastPath
+from metrics import ServerMetrics
+from nlu_batcher import NLUBatcher
+from response_cache import ResponseCache
+
+# Configure logging; per-message logs are DEBUG, sampled spans are logged at INFO
+logging.basicConfig(level=os.environ.get('RASA_LOG_LEVEL', 'INFO').upper())
 logger = logging.getLogger(__name__)
 
+UNAVAILABLE_MESSAGE = "I'm currently unavailable. Please try again later."
+NOT_UNDERSTOOD_MESSAGE = "I'm sorry, I didn't understand that. Can you please rephrase?"
+BUSY_MESSAGE = "I'm handling a lot of questions right now. Please try again in a moment."
+ERROR_MESSAGE = "I'm sorry, I encountered an error. Please try again."
+MODEL_SETTLE_SECONDS = 5
+
+class ServerBusy(Exception):
+    """Raised when a message is rejected to apply backpressure"""
+
+    def __init__(self, status: int, reason: str):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+
+class SocketIOStreamChannel(CollectingOutputChannel):
+    """Collects the bot's messages and emits each one to the Socket.IO client as soon as it is produced"""
+
+    def __init__(self, sio: socketio.AsyncServer, sid: str):
+        super().__init__()
+        self.sio = sio
+        self.sid = sid
+        self.sent = 0
+
+    @classmethod
+    def name(cls) -> str:
+        return "socketio_stream"
+
+    async def _persist_message(self, message: Dict[str, Any]) -> None:
+        await super()._persist_message(message)
+        await self.emit(message)
+
+    async def emit(self, message: Dict[str, Any]):
+        """Send one bot message as a 'bot_message' chunk"""
+        chunk = {
+            'text': message.get('text') or '',
+            'index': self.sent,
+            'timestamp': str(asyncio.get_event_loop().time()),
+        }
+        for key in ('buttons', 'image', 'attachment', 'custom'):
+            if message.get(key):
+                chunk[key] = message[key]
+        self.sent += 1
+        await self.sio.emit('bot_message', chunk, room=self.sid)
+
+def latest_model(models_dir: str) -> Optional[str]:
+    """Path of the most recently written model archive, if any"""
+    models = glob.glob(os.path.join(models_dir, "*.tar.gz"))
+    return max(models, key=os.path.getmtime) if models else None
+
 class RasaChatbotServer:
-    def __init__(self):
+    def __init__(self, max_in_flight: int = 64, max_pending_per_sender: int = 5,
+                 tracker_store: str = "memory", lock_store: str = "memory",
+                 store_db: str = "conversations.db", max_conversations: int = 10000,
+                 nlu_batch_size: int = 1, nlu_batch_wait_ms: float = 10.0,
+                 response_cache_size: int = 1024, models_dir: str = "models",
+                 model_watch_interval: float = 10.0, admin_token: str = "",
+                 trace_sample_rate: float = 0.01, redis_url: str = "",
+                 socketio_manager_url: str = "", websocket_only: bool = False,
+                 worker_id: Optional[int] = None, stream_responses: bool = True,
+                 fast_path: bool = False, fast_path_threshold: Optional[float] = None):
         self.agent = None
-        self.sio = socketio.AsyncServer(cors_allowed_origins="*")
+        self.worker_id = worker_id
+        self.stream_responses = stream_responses
+        self.models_dir = models_dir
+        self.model_path = None
+        self.model_watch_interval = model_watch_interval
+        self.admin_token = admin_token
+        # 'loading' until the first model is ready, then 'healthy' (or 'degraded' if it failed)
+        self.status = 'loading'
+        self.reloading = False
+        self.failed_model_path = None
+        self.started_at = time.monotonic()
+        self.load_metrics: Dict[str, Any] = {'startup_to_ready_s': None, 'swaps': 0, 'last_swap_s': None}
+        self.max_in_flight = max_in_flight
+        self.max_pending_per_sender = max_pending_per_sender
+        self.in_flight = 0
+        self.sender_locks = SenderLocks()
+        redis_url = redis_url or DEFAULT_REDIS_URL
+        self.tracker_store = create_tracker_store(tracker_store, store_db, max_conversations, redis_url)
+        self.lock_store = create_lock_store(lock_store, store_db, redis_url)
+        # A batch size of 1 keeps the original one-parse-per-message path
+        self.nlu_batcher = NLUBatcher(nlu_batch_size, nlu_batch_wait_ms) if nlu_batch_size > 1 else None
+        self.response_cache = ResponseCache(response_cache_size) if response_cache_size > 0 else None
+        self.metrics = ServerMetrics(trace_sample_rate)
+        # Loaded from models/fast_path.json together with each model (see train.py)
+        self.fast_path_enabled = fast_path
+        self.fast_path_threshold = fast_path_threshold
+        self.fast_path: Optional[FastPath] = None
+        self.fast_path_mtime: Optional[float] = None
+        # With several workers, a message queue lets any worker emit to any client, and
+        # websocket-only keeps each session on the worker that accepted its connection
+        sio_options: Dict[str, Any] = {'cors_allowed_origins': "*"}
+        if socketio_manager_url:
+            sio_options['client_manager'] = socketio.AsyncRedisManager(socketio_manager_url)
+        if websocket_only:
+            sio_options['transports'] = ['websocket']
+        self.sio = socketio.AsyncServer(**sio_options)
         self.app = web.Application()
         self.sio.attach(self.app)
         self.setup_routes()
         self.setup_socket_events()
 
-    async def load_agent(self):
-        """Load the trained Rasa agent"""
+    async def load_agent(self, model_path: Optional[str] = None) -> bool:
+        """Load a trained model off the event loop and swap it in once it has been warmed up.
+
+        The current agent keeps serving until the swap, and messages already in
+        progress finish on the agent they started with. Returns True on success.
+        """
+        if self.reloading:
+            return False
+        self.reloading = True
+        model_path = model_path or latest_model(self.models_dir) or self.models_dir
+        started = time.monotonic()
         try:
-            # Load the trained model
-            self.agent = Agent.load("models")
-            logger.info("Rasa agent loaded successfully")
+            loop = asyncio.get_running_loop()
+            # Each agent gets its own view of the conversations, so loading doesn't change the serving one's domain
+            agent = await loop.run_in_executor(None, functools.partial(
+                Agent.load, model_path, tracker_store=agent_view(self.tracker_store), lock_store=self.lock_store
+            ))
+            loaded = time.monotonic()
+            self.prepare_agent(agent)
+            # Warm-up inference so the first real message doesn't pay for lazy initialisation
+            await agent.parse_message("hello")
+            warmed = time.monotonic()
         except Exception as e:
-            logger.error(f"Failed to load Rasa agent: {e}")
-            # Create a fallback agent
-            self.agent = None
+            logger.error(f"Failed to load Rasa agent from {model_path}: {e}")
+            self.failed_model_path = model_path
+            if not self.agent:
+                self.status = 'degraded'
+            return False
+        finally:
+            self.reloading = False
+
+        first_load = self.agent is None
+        self.agent = agent
+        self.model_path = model_path
+        self.status = 'healthy'
+        if self.response_cache:
+            self.response_cache.invalidate(agent.model_id)
+        if self.fast_path_enabled:
+            self.load_fast_path()
+
+        if first_load and self.load_metrics['startup_to_ready_s'] is None:
+            self.load_metrics['startup_to_ready_s'] = round(warmed - self.started_at, 3)
+            logger.info(f"Rasa agent loaded from {model_path}: ready {warmed - self.started_at:.2f}s after startup "
+                        f"(load {loaded - started:.2f}s, warm-up {warmed - loaded:.2f}s)")
+        else:
+            self.load_metrics['swaps'] += 1
+            self.load_metrics['last_swap_s'] = round(warmed - started, 3)
+            logger.info(f"Swapped in model {model_path} in {warmed - started:.2f}s "
+                        f"(load {loaded - started:.2f}s, warm-up {warmed - loaded:.2f}s)")
+        return True
+
+    def prepare_agent(self, agent):
+        """Instrument an agent and serialise its graph runs with the NLU batches, before it serves"""
+        self.metrics.instrument(agent)
+        if self.nlu_batcher:
+            self.nlu_batcher.attach(agent)
+
+    def fast_path_file(self) -> str:
+        return os.path.join(self.models_dir, FAST_PATH_FILE)
+
+    def load_fast_path(self):
+        """Load the fast-path artifact written by train.py for the current model.
+
+        Without one, or with one checked against a different model, every
+        message goes to the model.
+        """
+        path = self.fast_path_file()
+        self.fast_path = None
+        self.fast_path_mtime = None
+        try:
+            self.fast_path_mtime = os.path.getmtime(path)
+            fast_path = FastPath.load(path, self.fast_path_threshold)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Fast path disabled, could not load {path}: {e}")
+            return
+        model = os.path.basename(self.model_path or '')
+        if fast_path.model != model:
+            logger.warning(f"Fast path disabled: {path} was built for model {fast_path.model}, not {model}")
+            return
+        self.fast_path = fast_path
+        logger.info(f"Fast path loaded from {path} for {sorted(fast_path.intents)}")
+
+    def fast_path_changed(self) -> bool:
+        try:
+            mtime: Optional[float] = os.path.getmtime(self.fast_path_file())
+        except OSError:
+            mtime = None
+        return mtime != self.fast_path_mtime
+
+    async def watch_models(self):
+        """Poll the models directory and hot-swap whenever a newer model appears"""
+        while True:
+            await asyncio.sleep(self.model_watch_interval)
+            # One failed check (e.g. an archive deleted while it was being looked at) must not stop the watcher
+            try:
+                await self.check_models()
+            except Exception:
+                logger.exception("Checking the models directory failed; trying again next interval")
+
+    async def check_models(self):
+        # train.py may rewrite or remove the fast path for the model already in use
+        if self.fast_path_enabled and self.agent and not self.reloading and self.fast_path_changed():
+            self.load_fast_path()
+        newest = latest_model(self.models_dir)
+        if not newest or newest in (self.model_path, self.failed_model_path) or self.reloading:
+            return
+        # Leave `rasa train` time to finish writing the archive
+        if time.time() - os.path.getmtime(newest) >= MODEL_SETTLE_SECONDS:
+            logger.info(f"New model detected: {newest}")
+            await self.load_agent(newest)
 
     def setup_routes(self):
         """Setup HTTP routes"""
         self.app.router.add_post('/webhook', self.webhook_handler)
         self.app.router.add_get('/health', self.health_check)
+        self.app.router.add_get('/metrics', self.metrics_handler)
+        self.app.router.add_post('/admin/reload', self.reload_handler)
 
     def setup_socket_events(self):
         """Setup Socket.IO events"""
         
         @self.sio.event
         async def connect(sid, environ):
-            logger.info(f"Client connected: {sid}")
+            logger.debug("Client connected: %s", sid)
 
         @self.sio.event
         async def disconnect(sid):
-            logger.info(f"Client disconnected: {sid}")
+            logger.debug("Client disconnected: %s", sid)
 
         @self.sio.event
         async def user_message(sid, data):
             """Handle incoming user messages"""
+            # Each socket session is its own conversation
+            message = data.get('message', '') if isinstance(data, dict) else str(data or '')
+            logger.debug("Received message from %s: %s", sid, message)
+            if self.stream_responses:
+                await self.stream_reply(sid, message)
+            else:
+                await self.send_reply(sid, message)
+
+    async def send_reply(self, sid: str, message: str):
+        """Emit the first bot utterance as a single 'bot_message' once the whole turn is done"""
+        try:
             try:
-                message = data.get('message', '')
-                logger.info(f"Received message from {sid}: {message}")
-                
-                if self.agent:
-                    # Process with Rasa
-                    response = await self.agent.handle_text(message)
-                    bot_message = response[0]['text'] if response else "I'm sorry, I didn't understand that. Can you please rephrase?"
-                else:
-                    # Fallback response
-                    bot_message = "I'm currently unavailable. Please try again later."
-                
-                # Send response back to client
-                await self.sio.emit('bot_message', {
-                    'text': bot_message,
-                    'timestamp': str(asyncio.get_event_loop().time())
-                }, room=sid)
-                
-            except Exception as e:
-                logger.error(f"Error processing message: {e}")
-                await self.sio.emit('bot_message', {
-                    'text': "I'm sorry, I encountered an error. Please try again.",
-                    'timestamp': str(asyncio.get_event_loop().time())
-                }, room=sid)
+                bot_message = self.first_text(await self.process_message(sid, message, transport='socketio'))
+            except ServerBusy as e:
+                logger.debug("Rejected message from %s: %s", sid, e.reason)
+                bot_message = BUSY_MESSAGE
+
+            # Send response back to client
+            await self.sio.emit('bot_message', {
+                'text': bot_message,
+                'timestamp': str(asyncio.get_event_loop().time())
+            }, room=sid)
+
+        except Exception as e:
+            logger.error(f"Error processing message: {e}")
+            await self.sio.emit('bot_message', {
+                'text': ERROR_MESSAGE,
+                'timestamp': str(asyncio.get_event_loop().time())
+            }, room=sid)
+
+    async def stream_reply(self, sid: str, message: str):
+        """Emit 'bot_typing' right away, each bot message as a 'bot_message' chunk the moment
+        the agent produces it, and 'bot_message_end' once the turn is complete"""
+        await self.sio.emit('bot_typing', {'timestamp': str(asyncio.get_event_loop().time())}, room=sid)
+        channel = SocketIOStreamChannel(self.sio, sid)
+        try:
+            try:
+                response = await self.process_message(sid, message, transport='socketio', output_channel=channel)
+            except ServerBusy as e:
+                logger.debug("Rejected message from %s: %s", sid, e.reason)
+                response = [{'text': BUSY_MESSAGE}]
+            if response is None:
+                response = [{'text': UNAVAILABLE_MESSAGE}]
+            # Cached replies and fallbacks never went through the channel
+            for bot_message in response[len(channel.messages):]:
+                await channel.emit(bot_message)
+            if not channel.sent:
+                await channel.emit({'text': NOT_UNDERSTOOD_MESSAGE})
+        except Exception as e:
+            logger.error(f"Error processing message: {e}")
+            await channel.emit({'text': ERROR_MESSAGE})
+        await self.sio.emit('bot_message_end', {
+            'count': channel.sent,
+            'timestamp': str(asyncio.get_event_loop().time())
+        }, room=sid)
 
     async def webhook_handler(self, request):
         """Handle webhook requests from Node.js backend"""
@@ -89,15 +328,17 @@ class RasaChatbotServer:
             message = data.get('message', '')
             user_id = data.get('user_id', 'unknown')
             
-            logger.info(f"Webhook received from {user_id}: {message}")
+            logger.debug("Webhook received from %s: %s", user_id, message)
             
-            if self.agent:
-                # Process with Rasa
-                response = await self.agent.handle_text(message)
-                bot_message = response[0]['text'] if response else "I'm sorry, I didn't understand that. Can you please rephrase?"
-            else:
-                # Fallback response
-                bot_message = "I'm currently unavailable. Please try again later."
+            try:
+                bot_message = self.first_text(await self.process_message(str(user_id), message))
+            except ServerBusy as e:
+                logger.debug("Rejected webhook message from %s: %s", user_id, e.reason)
+                return web.json_response({
+                    'error': e.reason,
+                    'response': BUSY_MESSAGE,
+                    'user_id': user_id
+                }, status=e.status, headers={'Retry-After': '1'})
             
             return web.json_response({
                 'response': bot_message,
@@ -109,24 +350,163 @@ class RasaChatbotServer:
             logger.error(f"Error in webhook handler: {e}")
             return web.json_response({
                 'error': 'Internal server error',
-                'response': "I'm sorry, I encountered an error. Please try again."
+                'response': ERROR_MESSAGE
             }, status=500)
 
+    async def process_message(self, sender_id: str, message: str, transport: str = 'webhook',
+                              output_channel: Optional[CollectingOutputChannel] = None
+                              ) -> Optional[List[Dict[str, Any]]]:
+        """Run a message through the agent on the sender's own tracker.
+
+        Messages from one sender are handled one at a time and in arrival order.
+        Bot messages also go to `output_channel` as they are produced (cached
+        and fast-path replies are only returned). Returns None when no agent is loaded; raises
+        ServerBusy (503 when the server is at capacity, 429 when one sender has
+        too many messages queued) instead of queuing without limit.
+        """
+        if self.in_flight >= self.max_in_flight:
+            self.metrics.reject(transport)
+            raise ServerBusy(503, "Server is at capacity")
+        if self.sender_locks.pending(sender_id) >= self.max_pending_per_sender:
+            self.metrics.reject(transport)
+            raise ServerBusy(429, "Too many pending messages for this conversation")
+
+        self.in_flight += 1
+        span = self.metrics.start(transport, sender_id)
+        outcome = 'error'
+        try:
+            async with self.sender_locks.hold(sender_id):
+                agent = self.agent
+                if not agent:
+                    outcome = 'unavailable'
+                    return None
+                if self.response_cache:
+                    cached = self.response_cache.get(agent.model_id, message, sender_id)
+                    if cached is not None:
+                        await self.response_cache.add_to_tracker(agent, sender_id, message, cached)
+                        outcome = 'cached'
+                        return cached.response
+                if self.fast_path:
+                    started = time.perf_counter()
+                    answer = self.fast_path.respond(message, sender_id)
+                    if answer is not None:
+                        self.metrics.observe_parse({'intent': {'name': answer[0]}}, time.perf_counter() - started)
+                        outcome = 'fast_path'
+                        return answer[1]
+                response = await self.handle_with_agent(agent, sender_id, message, output_channel)
+                outcome = 'ok'
+                return response
+        finally:
+            self.in_flight -= 1
+            self.metrics.finish(span, outcome)
+
+    async def handle_with_agent(self, agent, sender_id: str, message: str,
+                                output_channel: Optional[CollectingOutputChannel] = None
+                                ) -> Optional[List[Dict[str, Any]]]:
+        """Run the full NLU + policy stack, caching the reply when the turn was stateless"""
+        parse_data = None
+        if self.nlu_batcher:
+            started = time.perf_counter()
+            parse_data = await self.nlu_batcher.parse(agent, message)
+            if parse_data is not None:
+                self.metrics.observe_parse(parse_data, time.perf_counter() - started)
+        if parse_data is None:
+            # Parsed here rather than inside handle_message, so the cache can decide from the intent
+            parse_data = await agent.parse_message(message)
+        response = await agent.handle_message(UserMessage(
+            message, output_channel or CollectingOutputChannel(), sender_id, parse_data=parse_data
+        ))
+
+        if self.response_cache and self.response_cache.is_candidate(parse_data):
+            await self.response_cache.store_if_stateless(agent, sender_id, message, response)
+        return response
+
+    @staticmethod
+    def first_text(response: Optional[List[Dict[str, Any]]]) -> str:
+        """Text of the first bot utterance, or the matching fallback message"""
+        if response is None:
+            return UNAVAILABLE_MESSAGE
+        texts = [r['text'] for r in response if r.get('text')]
+        return texts[0] if texts else NOT_UNDERSTOOD_MESSAGE
+
+    async def reload_handler(self, request):
+        """Admin endpoint: load the newest model in models/ and swap it in"""
+        if not self.admin_token or request.headers.get('Authorization') != f"Bearer {self.admin_token}":
+            return web.json_response({'error': 'Forbidden'}, status=403)
+        if self.reloading:
+            return web.json_response({'error': 'A model is already loading'}, status=409)
+        if not await self.load_agent():
+            return web.json_response({'error': 'Model failed to load', 'model': self.model_path}, status=500)
+        return web.json_response({'model': self.model_path, **self.load_metrics})
+
+    async def metrics_handler(self, request):
+        """Prometheus metrics endpoint"""
+        return web.Response(text=self.metrics.render(),
+                            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+
     async def health_check(self, request):
         """Health check endpoint"""
         return web.json_response({
-            'status': 'healthy',
+            'status': self.status,
+            'worker': self.worker_id,
             'agent_loaded': self.agent is not None,
+            'model': self.model_path,
+            'reloading': self.reloading and self.agent is not None,
+            'model_loading': self.load_metrics,
+            'in_flight': self.in_flight,
+            'max_in_flight': self.max_in_flight,
+            'nlu_batching': self.nlu_batcher.stats() if self.nlu_batcher else None,
+            'response_cache': self.response_cache.stats() if self.response_cache else None,
+            'fast_path': self.fast_path.stats() if self.fast_path else None,
             'timestamp': str(asyncio.get_event_loop().time())
         })
 
-    async def start_server(self, host='localhost', port=5005):
-        """Start the server"""
-        await self.load_agent()
-        
-        logger.info(f"Starting Rasa chatbot server on {host}:{port}")
-        web.run_app(self.app, host=host, port=port)
+    async def start_server(self, host='localhost', port=5005, load_model=True, reuse_port=False):
+        """Start the server; the model loads in the background while /health reports 'loading'
+
+        With load_model=False the caller provides `self.agent` (used by the load tests).
+        With reuse_port=True several worker processes can listen on the same port.
+        """
+        runner = web.AppRunner(self.app)
+        await runner.setup()
+        await web.TCPSite(runner, host, port, reuse_port=reuse_port or None).start()
+        worker = f" (worker {self.worker_id}, pid {os.getpid()})" if self.worker_id is not None else ""
+        logger.info(f"Starting Rasa chatbot server on {host}:{port}{worker}")
+
+        if load_model:
+            asyncio.ensure_future(self.load_agent())
+        if load_model and self.model_watch_interval > 0:
+            asyncio.ensure_future(self.watch_models())
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
 
 if __name__ == '__main__':
-    server = RasaChatbotServer()
-    asyncio.run(server.start_server())
+    settings = dict(
+        max_in_flight=int(os.environ.get('RASA_MAX_IN_FLIGHT', '64')),
+        max_pending_per_sender=int(os.environ.get('RASA_MAX_PENDING_PER_SENDER', '5')),
+        tracker_store=os.environ.get('RASA_TRACKER_STORE', 'memory'),
+        lock_store=os.environ.get('RASA_LOCK_STORE', 'memory'),
+        store_db=os.environ.get('RASA_STORE_DB', 'conversations.db'),
+        max_conversations=int(os.environ.get('RASA_MAX_CONVERSATIONS', '10000')),
+        nlu_batch_size=int(os.environ.get('RASA_NLU_BATCH_SIZE', '1')),
+        nlu_batch_wait_ms=float(os.environ.get('RASA_NLU_BATCH_WAIT_MS', '10')),
+        response_cache_size=int(os.environ.get('RASA_RESPONSE_CACHE_SIZE', '1024')),
+        models_dir=os.environ.get('RASA_MODELS_DIR', 'models'),
+        model_watch_interval=float(os.environ.get('RASA_MODEL_WATCH_INTERVAL', '10')),
+        admin_token=os.environ.get('RASA_ADMIN_TOKEN', ''),
+        trace_sample_rate=float(os.environ.get('RASA_TRACE_SAMPLE_RATE', '0.01')),
+        redis_url=os.environ.get('RASA_REDIS_URL', ''),
+        socketio_manager_url=os.environ.get('RASA_SOCKETIO_MANAGER_URL', ''),
+        stream_responses=os.environ.get('RASA_STREAM_RESPONSES', '1') != '0',
+        fast_path=os.environ.get('RASA_FAST_PATH', '0') == '1',
+        fast_path_threshold=float(os.environ['RASA_FAST_PATH_THRESHOLD'])
+        if os.environ.get('RASA_FAST_PATH_THRESHOLD') else None,
+    )
+    workers = int(os.environ.get('RASA_WORKERS', '1'))
+    if workers > 1:
+        from workers import serve_workers
+        serve_workers(workers, 'localhost', 5005, settings)
+    else:
+        asyncio.run(RasaChatbotServer(**settings).start_server())
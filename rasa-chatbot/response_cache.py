@@ -0,0 +1,164 @@
+"""
+Response cache for stateless chatbot questions.
+
+Greetings and FAQ-style questions ("what is SAC", "nirf rankings") always get
+the same static answer, so after the first time the bot answers one, the
+reply is cached under the message text, normalized the same way as for the
+fast path (see fast_path.py), and the loaded model's fingerprint. Only intents whose every rule/story continuation is a static
+`utter_*` response from domain.yml are eligible, and a reply is cached only
+if the turn really ran nothing but those responses and extracted no entities.
+Slot-dependent custom actions are therefore never cached.
+
+A cache hit skips NLU and the policies, but the turn stored with the reply
+(the user message, the actions and the bot messages) is appended to the
+sender's tracker, so the conversation history is the same as if the model had
+answered.
+"""
+
+import copy
+import os
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Text
+
+from rasa.shared.core.events import ActionExecuted, Event, UserUttered
+
+from fast_path import BOT_DIR, load_yaml, normalize
+
+ACTION_LISTEN = "action_listen"
+
+
+def find_static_intents(bot_dir: Text = BOT_DIR) -> Set[Text]:
+    """Intents that rules.yml and stories.yml only ever answer with static domain responses."""
+    responses = set(load_yaml(os.path.join(bot_dir, "domain.yml")).get("responses", {}))
+    followers: Dict[Text, Set[Text]] = {}
+    for path, key in (("data/rules.yml", "rules"), ("data/stories.yml", "stories")):
+        for flow in load_yaml(os.path.join(bot_dir, path)).get(key, []):
+            # Rules guarded by conditions depend on conversation state
+            stateful = bool(flow.get("condition"))
+            intent = None
+            for step in flow.get("steps", []):
+                if "intent" in step:
+                    intent = step["intent"]
+                    followers.setdefault(intent, set())
+                    if step.get("entities"):
+                        followers[intent].add("<entities>")
+                elif intent and "action" in step:
+                    followers[intent].add("<stateful>" if stateful else step["action"])
+                elif intent:
+                    followers[intent].add("<stateful>")
+    return {intent for intent, actions in followers.items() if actions and actions <= responses}
+
+
+class CachedTurn(NamedTuple):
+    response: List[Dict[Text, Any]]
+    # The turn's tracker events, from the UserUttered on, as dicts
+    events: List[Dict[Text, Any]]
+
+
+class ResponseCache:
+    """LRU cache of bot replies keyed on (model fingerprint, normalized text)."""
+
+    def __init__(self, max_entries: int = 1024, static_intents: Optional[Set[Text]] = None):
+        self.max_entries = max_entries
+        self.static_intents = find_static_intents() if static_intents is None else static_intents
+        self._entries: "OrderedDict[tuple, CachedTurn]" = OrderedDict()
+        self._model_id: Optional[Text] = None
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.invalidations = 0
+
+    def invalidate(self, model_id: Optional[Text] = None):
+        """Drop every entry; called whenever a model is loaded."""
+        self._entries.clear()
+        self._model_id = model_id
+        self.invalidations += 1
+
+    def get(self, model_id: Text, text: Text, sender_id: Text) -> Optional[CachedTurn]:
+        """The cached turn for `text`, with the reply addressed to `sender_id`."""
+        if model_id != self._model_id:
+            self.invalidate(model_id)
+        key = (model_id, normalize(text))
+        turn = self._entries.get(key)
+        if turn is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        turn = copy.deepcopy(turn)
+        for message in turn.response:
+            message["recipient_id"] = sender_id
+        return turn
+
+    async def add_to_tracker(self, agent: Any, sender_id: Text, text: Text, turn: CachedTurn):
+        """Append a cached turn to the sender's tracker, as the model would have."""
+        events = []
+        for params in turn.events:
+            params = {k: v for k, v in params.items() if k not in ("timestamp", "message_id")}
+            if params.get("event") == UserUttered.type_name:
+                params["text"] = text
+                params["parse_data"] = {**params.get("parse_data", {}), "text": text}
+            events.append(Event.from_parameters(params))
+        async with agent.lock_store.lock(sender_id):
+            tracker = await agent.processor.fetch_tracker_and_update_session(sender_id)
+            for event in events:
+                tracker.update(event)
+            await agent.processor.save_tracker(tracker)
+
+    def is_candidate(self, parse_data: Optional[Dict[Text, Any]]) -> bool:
+        """Cheap pre-check on parse data, before looking at the tracker."""
+        if parse_data is None:
+            return False
+        intent = (parse_data.get("intent") or {}).get("name")
+        return intent in self.static_intents and not parse_data.get("entities")
+
+    async def store_if_stateless(self, agent: Any, sender_id: Text, text: Text,
+                                 response: Optional[List[Dict[Text, Any]]]):
+        """Cache `response` if the turn that produced it was a stateless static reply."""
+        if not response or self.max_entries <= 0:
+            return
+        tracker = await agent.tracker_store.retrieve(sender_id)
+        if tracker is None or not self._turn_is_stateless(tracker):
+            return
+        model_id = agent.model_id
+        if model_id != self._model_id:
+            self.invalidate(model_id)
+        key = (model_id, normalize(text))
+        self._entries[key] = CachedTurn(copy.deepcopy(response), self._turn_events(tracker))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self.stores += 1
+
+    def _turn_is_stateless(self, tracker: Any) -> bool:
+        latest = tracker.latest_message
+        if latest is None or latest.entities:
+            return False
+        if (latest.intent or {}).get("name") not in self.static_intents:
+            return False
+        actions = []
+        for event in reversed(tracker.events):
+            if isinstance(event, UserUttered):
+                break
+            if isinstance(event, ActionExecuted) and event.action_name != ACTION_LISTEN:
+                actions.append(event.action_name)
+        return bool(actions) and all(a.startswith("utter_") for a in actions)
+
+    @staticmethod
+    def _turn_events(tracker: Any) -> List[Dict[Text, Any]]:
+        events = list(tracker.events)
+        start = max(i for i, event in enumerate(events) if isinstance(event, UserUttered))
+        return [event.as_dict() for event in events[start:]]
+
+    def stats(self) -> Dict[Text, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "invalidations": self.invalidations,
+            "static_intents": sorted(self.static_intents),
+        }
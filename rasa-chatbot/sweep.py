@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Pipeline and epoch sweep for the Rasa chatbot (`python train.py --sweep`)
+
+Every variant in sweep.yml is derived from config.yml and evaluated in its own
+worker process, pinned to its own slice of CPU cores:
+
+1. intent/entity cross-validation on data/nlu.yml (weighted F1)
+2. an NLU model trained with the variant's config (model size on disk)
+3. per-message parse latency of that model
+
+The results are ranked by F1 per millisecond of inference latency and written
+to sweeps/<timestamp>/results.json.
+"""
+
+import asyncio
+import copy
+import json
+import multiprocessing
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import yaml
+
+from fast_path import load_examples
+from train import CONFIG_FILE, DATA_DIR, bot_path, run_command
+
+# Like train.py's, relative to the bot directory, where rasa runs
+SWEEP_FILE = "sweep.yml"
+SWEEP_DIR = "sweeps"
+NLU_FILE = os.path.join(DATA_DIR, "nlu.yml")
+LATENCY_SAMPLES = 200
+
+def matches(item, selector):
+    """Whether a pipeline/policy item is picked by 'Name' or 'Name:analyzer'"""
+    name = item.get("name")
+    return selector == name or selector == f"{name}:{item.get('analyzer', '')}"
+
+def build_variant_config(base, variant):
+    """Apply a sweep.yml variant's overrides to the base config"""
+    config = copy.deepcopy(base)
+    sections = [config.get("pipeline") or [], config.get("policies") or []]
+
+    if "epochs" in variant:
+        for section in sections:
+            for item in section:
+                if "epochs" in item:
+                    item["epochs"] = variant["epochs"]
+
+    removed = variant.get("remove", [])
+    config["pipeline"] = [item for item in config.get("pipeline") or []
+                          if not any(matches(item, selector) for selector in removed)]
+    sections[0] = config["pipeline"]
+
+    for selector, settings in (variant.get("components") or {}).items():
+        for section in sections:
+            for item in section:
+                if matches(item, selector):
+                    item.update(settings)
+    return config
+
+def _claim_cores(core_slots):
+    """Pool initializer: pin this worker (and the rasa processes it starts) to its core slice"""
+    cores = core_slots.get()
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    threads = str(len(cores))
+    os.environ["OMP_NUM_THREADS"] = threads
+    os.environ["TF_INTRA_OP_PARALLELISM_THREADS"] = threads
+    os.environ["TF_INTER_OP_PARALLELISM_THREADS"] = "1"
+
+def weighted_f1(report_path):
+    try:
+        with open(report_path, encoding="utf-8") as f:
+            return json.load(f)["weighted avg"]["f1-score"]
+    except (OSError, KeyError, ValueError):
+        return None
+
+def sample_messages():
+    """Example texts from data/nlu.yml without entity markup, used to time inference"""
+    return [text for texts in load_examples().values() for text in texts]
+
+def measure_latency(model_path, texts):
+    """Mean and p95 per-message parse time of a trained model, in milliseconds"""
+    from rasa.core.agent import Agent
+
+    agent = Agent.load(model_path)
+
+    async def parse_all():
+        await agent.parse_message("hello")
+        timings = []
+        for i in range(LATENCY_SAMPLES):
+            started = time.perf_counter()
+            await agent.parse_message(texts[i % len(texts)])
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    timings = sorted(asyncio.run(parse_all()))
+    return statistics.mean(timings), timings[int(len(timings) * 0.95)]
+
+def evaluate_variant(variant, base_config, out_dir, folds):
+    """Cross-validate, train and time one variant (runs in a worker process)"""
+    name = variant["name"]
+    work_dir = os.path.join(out_dir, name)
+    os.makedirs(work_dir, exist_ok=True)
+    config_path = os.path.join(work_dir, "config.yml")
+    with open(config_path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(build_variant_config(base_config, variant), f, sort_keys=False)
+
+    result = {"name": name, "cores": sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else None}
+
+    started = time.perf_counter()
+    results_dir = os.path.join(work_dir, "results")
+    if not run_command(f"rasa test nlu --nlu {NLU_FILE} --config {config_path} "
+                       f"--cross-validation --folds {folds} --out {results_dir}"):
+        return dict(result, error="cross-validation failed")
+    result["cv_seconds"] = round(time.perf_counter() - started, 1)
+    result["intent_f1"] = weighted_f1(os.path.join(results_dir, "intent_report.json"))
+    result["entity_f1"] = weighted_f1(os.path.join(results_dir, "DIETClassifier_report.json"))
+
+    started = time.perf_counter()
+    models_dir = os.path.join(work_dir, "models")
+    if not run_command(f"rasa train nlu --nlu {NLU_FILE} --config {config_path} "
+                       f"--out {models_dir} --fixed-model-name {name}"):
+        return dict(result, error="training failed")
+    result["train_seconds"] = round(time.perf_counter() - started, 1)
+    model_path = os.path.join(models_dir, f"{name}.tar.gz")
+    result["model_mb"] = round(os.path.getsize(model_path) / 1e6, 2)
+
+    mean_ms, p95_ms = measure_latency(model_path, sample_messages())
+    result["latency_ms"] = round(mean_ms, 2)
+    result["latency_p95_ms"] = round(p95_ms, 2)
+    result["f1_per_ms"] = round((result["intent_f1"] or 0.0) / mean_ms, 4) if mean_ms else None
+    return result
+
+def format_metric(value, spec):
+    """`value` formatted with `spec`, or "-" when the metric is missing"""
+    return format(value, spec) if isinstance(value, (int, float)) else "-"
+
+def print_table(results):
+    header = f"{'rank':<5}{'variant':<20}{'intent F1':>10}{'entity F1':>10}{'ms/msg':>8}{'p95 ms':>8}{'MB':>7}{'F1/ms':>8}"
+    print(header)
+    print("-" * len(header))
+    for rank, r in enumerate(results, 1):
+        if "error" in r:
+            print(f"{'-':<5}{r['name']:<20}  {r['error']}")
+            continue
+        print(f"{rank:<5}{r['name']:<20}{format_metric(r['intent_f1'], '.3f'):>10}{format_metric(r['entity_f1'], '.3f'):>10}"
+              f"{format_metric(r['latency_ms'], '.1f'):>8}{format_metric(r['latency_p95_ms'], '.1f'):>8}"
+              f"{format_metric(r['model_mb'], '.1f'):>7}{format_metric(r['f1_per_ms'], '.4f'):>8}")
+
+def run_sweep(sweep_file=SWEEP_FILE, jobs=None, cores_per_job=1, folds=5):
+    """Evaluate every variant in `sweep_file` in parallel and print a ranked table"""
+    with open(bot_path(CONFIG_FILE), encoding="utf-8") as f:
+        base_config = yaml.safe_load(f)
+    with open(bot_path(sweep_file), encoding="utf-8") as f:
+        variants = yaml.safe_load(f).get("variants", [])
+    if not variants:
+        print(f"❌ No variants found in {sweep_file}")
+        return False
+
+    cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    cores_per_job = max(1, min(cores_per_job, len(cpus)))
+    jobs = max(1, min(jobs or len(cpus) // cores_per_job, len(cpus) // cores_per_job, len(variants)))
+    out_dir = bot_path(os.path.join(SWEEP_DIR, datetime.now().strftime("%Y%m%d-%H%M%S")))
+    os.makedirs(out_dir, exist_ok=True)
+
+    print(f"🧪 Sweeping {len(variants)} variants, {jobs} at a time with {cores_per_job} core(s) each")
+    print(f"   Results in {out_dir}")
+
+    manager = multiprocessing.Manager()
+    core_slots = manager.Queue()
+    for i in range(jobs):
+        core_slots.put(set(cpus[i * cores_per_job:(i + 1) * cores_per_job]))
+
+    results = []
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_claim_cores, initargs=(core_slots,)) as pool:
+        futures = {pool.submit(evaluate_variant, v, base_config, out_dir, folds): v["name"] for v in variants}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"name": futures[future], "error": str(e)}
+            print(f"{'✗' if 'error' in result else '✓'} {result['name']}")
+            results.append(result)
+
+    results.sort(key=lambda r: ("error" in r, -(r.get("f1_per_ms") or 0.0)))
+    print()
+    print_table(results)
+    with open(os.path.join(out_dir, "results.json"), "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    return any("error" not in r for r in results)
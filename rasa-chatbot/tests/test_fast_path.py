@@ -0,0 +1,26 @@
+from fast_path import load_examples, normalize
+
+
+def test_normalize_drops_case_punctuation_and_apostrophes():
+    assert normalize("  What's   SAC?! ") == "whats sac"
+    assert normalize("hi_there") == "hi there"
+
+
+def test_normalize_keeps_words_in_other_scripts():
+    assert normalize("నమస్కారం!") == "నమస్కారం"
+    assert normalize("నమస్కారం") != normalize("ధన్యవాదాలు")
+
+
+def test_examples_have_no_entity_markup(tmp_path):
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "nlu.yml").write_text(
+        "nlu:\n"
+        "- intent: ask_about_sac\n"
+        "  examples: |\n"
+        "    - tell me about [sac](body)\n"
+        '    - what is [e cell]{"entity": "body"}\n'
+        "- synonym: sac\n"
+        "  examples: |\n"
+        "    - student council\n"
+    )
+    assert load_examples(str(tmp_path)) == {"ask_about_sac": ["tell me about sac", "what is e cell"]}
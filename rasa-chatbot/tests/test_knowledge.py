@@ -0,0 +1,67 @@
+import pytest
+
+from knowledge import AliasIndex, KnowledgeStore, edit_distance, max_edits
+
+
+@pytest.fixture
+def index() -> AliasIndex:
+    index = AliasIndex()
+    for alias, entry_id in [
+        ("SAC", "sac"),
+        ("Student Activities Council", "sac"),
+        ("PR", "pr"),
+        ("SAC public relations", "pr"),
+        ("alumni", "alumni"),
+        ("entrepreneurship", "e_cell"),
+        ("NSS", "nss"),
+    ]:
+        index.add(alias, entry_id)
+    return index
+
+
+def test_allowed_typos_grow_with_word_length():
+    assert [max_edits("x" * n) for n in (3, 4, 7, 8)] == [0, 1, 1, 2]
+
+
+def test_transposition_is_one_edit():
+    assert edit_distance("alumni", "almuni") == 1
+    assert edit_distance("alumni", "lumnii") == 2
+
+
+def test_only_whole_words_match(index):
+    assert index.find("who is prakash") is None
+    assert index.find("tell me about pr") == "pr"
+
+
+def test_short_words_are_not_corrected(index):
+    assert index.find("nsa") is None
+    assert index.find("nss") == "nss"
+
+
+def test_medium_words_allow_one_typo(index):
+    assert index.find("almni meet") == "alumni"
+    assert index.find("almuni") == "alumni"
+    assert index.find("lumnii") is None
+
+
+def test_long_words_allow_two_typos(index):
+    assert index.find("entreprenuershp") == "e_cell"
+    assert index.find("entrprenuershp") is None
+
+
+def test_longest_alias_wins(index):
+    assert index.find("sac public relations team") == "pr"
+    assert index.find("studnet activities councl") == "sac"
+
+
+def test_new_aliases_invalidate_remembered_corrections(index):
+    assert index.find("crickt") is None
+    index.add("cricket", "sports")
+    assert index.find("crickt") == "sports"
+
+
+def test_knowledge_file_answers():
+    bodies = KnowledgeStore.load()["student_bodies"]
+    assert bodies.respond(None) == bodies.overview
+    assert bodies.respond("zzz") == bodies.unknown
+    assert bodies.lookup("E-Cell")["id"] == "e_cell"
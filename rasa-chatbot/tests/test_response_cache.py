@@ -0,0 +1,101 @@
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("rasa.shared.core.events")
+
+from rasa.shared.core.events import ActionExecuted, BotUttered, UserUttered  # noqa: E402
+from rasa.shared.core.trackers import DialogueStateTracker  # noqa: E402
+
+from response_cache import ResponseCache, find_static_intents  # noqa: E402
+
+GREETING = [{"recipient_id": "alice", "text": "Hello! How can I help?"}]
+
+
+def make_agent(*events, model_id: str = "model-1") -> SimpleNamespace:
+    """Agent with one conversation per sender, the first one holding `events`."""
+    trackers = {"alice": DialogueStateTracker.from_events("alice", [ActionExecuted("action_listen"), *events])}
+
+    async def retrieve(sender_id):
+        return trackers.get(sender_id)
+
+    async def fetch_tracker_and_update_session(sender_id):
+        return trackers.setdefault(sender_id, DialogueStateTracker(sender_id, None))
+
+    async def save_tracker(tracker):
+        trackers[tracker.sender_id] = tracker
+
+    @asynccontextmanager
+    async def lock(sender_id):
+        yield
+
+    return SimpleNamespace(
+        model_id=model_id,
+        trackers=trackers,
+        tracker_store=SimpleNamespace(retrieve=retrieve),
+        lock_store=SimpleNamespace(lock=lock),
+        processor=SimpleNamespace(fetch_tracker_and_update_session=fetch_tracker_and_update_session,
+                                  save_tracker=save_tracker),
+    )
+
+
+def greet(entities=()) -> UserUttered:
+    return UserUttered("Hi!", intent={"name": "greet", "confidence": 1.0}, entities=list(entities))
+
+
+def test_static_intents_exclude_custom_actions_and_conditions(tmp_path):
+    (tmp_path / "data").mkdir()
+    (tmp_path / "domain.yml").write_text("responses:\n  utter_greet: []\n  utter_help: []\n")
+    (tmp_path / "data" / "rules.yml").write_text(
+        "rules:\n"
+        "- steps: [{intent: greet}, {action: utter_greet}]\n"
+        "- steps: [{intent: ask_about_sac}, {action: action_get_student_body_info}]\n"
+        "- condition: [{slot_was_set: [name: x]}]\n"
+        "  steps: [{intent: ask_about_help}, {action: utter_help}]\n"
+    )
+    (tmp_path / "data" / "stories.yml").write_text("stories: []\n")
+    assert find_static_intents(str(tmp_path)) == {"greet"}
+
+
+def test_candidates_are_static_intents_without_entities():
+    cache = ResponseCache(static_intents={"greet"})
+    assert not cache.is_candidate(None)
+    assert cache.is_candidate({"intent": {"name": "greet"}, "entities": []})
+    assert not cache.is_candidate({"intent": {"name": "greet"}, "entities": [{"entity": "name"}]})
+    assert not cache.is_candidate({"intent": {"name": "ask_about_sac"}, "entities": []})
+
+
+def test_stateless_reply_is_cached_under_the_normalized_text():
+    cache = ResponseCache(static_intents={"greet"})
+    agent = make_agent(greet(), ActionExecuted("utter_greet"))
+    asyncio.run(cache.store_if_stateless(agent, "alice", "Hi!", GREETING))
+    cached = cache.get("model-1", "  hi ", "bob")
+    assert cached.response == [{"recipient_id": "bob", "text": "Hello! How can I help?"}]
+    # Another model's replies are never served
+    assert cache.get("model-2", "hi", "bob") is None
+
+
+def test_cached_turn_is_added_to_the_tracker():
+    cache = ResponseCache(static_intents={"greet"})
+    agent = make_agent(greet(), ActionExecuted("utter_greet"), BotUttered("Hello! How can I help?"),
+                       ActionExecuted("action_listen"))
+    asyncio.run(cache.store_if_stateless(agent, "alice", "Hi!", GREETING))
+    asyncio.run(cache.add_to_tracker(agent, "bob", "hi", cache.get("model-1", "hi", "bob")))
+    tracker = agent.trackers["bob"]
+    assert tracker.latest_message.text == "hi"
+    assert tracker.latest_message.intent["name"] == "greet"
+    assert tracker.latest_bot_utterance.text == "Hello! How can I help?"
+    assert tracker.latest_action_name == "action_listen"
+
+
+@pytest.mark.parametrize("events", [
+    [greet(), ActionExecuted("action_get_student_body_info")],
+    [greet([{"entity": "name", "value": "Sam"}]), ActionExecuted("utter_greet")],
+    [UserUttered("sac", intent={"name": "ask_about_sac", "confidence": 1.0}), ActionExecuted("utter_greet")],
+])
+def test_turns_that_depend_on_state_are_not_cached(events):
+    cache = ResponseCache(static_intents={"greet"})
+    asyncio.run(cache.store_if_stateless(make_agent(*events), "alice", "Hi!", GREETING))
+    assert cache.stats()["stores"] == 0
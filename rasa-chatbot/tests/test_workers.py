@@ -0,0 +1,65 @@
+from types import SimpleNamespace
+
+import pytest
+
+import workers
+from workers import MAX_RESTARTS, STABLE_SECONDS, WorkerPool
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(workers.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def pool(clock):
+    """Pool with one worker whose processes are fakes that have already exited."""
+    pool = WorkerPool(1, "127.0.0.1", 0, {})
+    pool.started = []
+
+    def start_worker(index):
+        pool.processes[index] = SimpleNamespace(pid=len(pool.started), exitcode=1, is_alive=lambda: False)
+        pool._started_at[index] = clock[0]
+        pool.started.append(clock[0])
+
+    pool._start_worker = start_worker
+    pool.start()
+    return pool
+
+
+def run_until_restarted(pool, clock) -> float:
+    """Seconds until the dead worker is restarted."""
+    waited, restarts = 0.0, len(pool.started)
+    while len(pool.started) == restarts:
+        pool.check_workers()
+        clock[0] += 1
+        waited += 1
+    return waited - 1
+
+
+def test_restart_delay_doubles(pool, clock):
+    delays = [run_until_restarted(pool, clock) for _ in range(MAX_RESTARTS)]
+    assert delays == [1, 2, 4, 8, 16]
+
+
+def test_gives_up_after_repeated_crashes(pool, clock):
+    for _ in range(MAX_RESTARTS):
+        run_until_restarted(pool, clock)
+    with pytest.raises(RuntimeError, match="keeps exiting"):
+        pool.check_workers()
+
+
+def test_staying_up_resets_the_backoff(pool, clock):
+    for _ in range(3):
+        run_until_restarted(pool, clock)
+    clock[0] += STABLE_SECONDS
+    assert run_until_restarted(pool, clock) == 1
+
+
+def test_stopping_pool_restarts_nothing(pool, clock):
+    pool.stopping = True
+    clock[0] += 100
+    pool.check_workers()
+    assert len(pool.started) == 1
@@ -1,16 +1,70 @@
 #!/usr/bin/env python3
 """
 Training script for Rasa chatbot
+
+Fingerprints config.yml, domain.yml and every file under data/ and compares
+them with the last successful run:
+
+* nothing changed              -> training is skipped
+* only NLU data changed        -> NLU-side retrain
+* only stories/rules changed   -> core-side retrain
+* config or domain changed     -> full retrain
+
+Rasa packs NLU and core into one model, and the server needs both, so every
+plan runs the same `rasa train` and produces a complete model. The savings of
+a one-sided plan come from Rasa's graph cache (.rasa/cache in the bot
+directory), which reuses every component whose inputs are unchanged, so only
+that side's components are retrained. `--finetune` instead continues from the
+previous model with a fraction of the epochs. Rasa then rewrites `epochs` for
+every component that has it (DIET, ResponseSelector, TEDPolicy,
+UnexpecTEDIntentPolicy), which changes their cache fingerprints, so every
+trainable component on both sides is retrained, only more briefly. Each run
+writes a JSON report with the plan, what was retrained and where the reused
+components came from, and per-stage wall times. Paths are resolved from the
+bot directory, not the current directory.
+
+The new model is trained into models/.staging, and the fast path (see
+fast_path.py) is rebuilt from the same data and checked against it. The
+artifact is written to models/fast_path.json (or an old one removed) before
+the archive is moved into models/, so a server watching that directory never
+swaps the new model in next to the previous run's fast path.
 """
 
+import argparse
+import asyncio
+import glob
+import hashlib
+import json
+import os
 import subprocess
 import sys
-import os
+import time
+from datetime import datetime
+
+import yaml
+
+BOT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Relative to BOT_DIR, which is also where `rasa train` runs
+CONFIG_FILE = "config.yml"
+DOMAIN_FILE = "domain.yml"
+DATA_DIR = "data"
+MODELS_DIR = "models"
+FINGERPRINT_FILE = os.path.join(MODELS_DIR, ".train_fingerprint.json")
+REPORT_FILE = os.path.join(MODELS_DIR, "training_report.json")
+FAST_PATH_PATH = os.path.join(MODELS_DIR, "fast_path.json")
+STAGING_DIR = os.path.join(MODELS_DIR, ".staging")
+
+NLU_KEYS = {"nlu"}
+CORE_KEYS = {"stories", "rules"}
+
+def bot_path(path):
+    """`path` resolved from the bot directory (absolute paths are kept)"""
+    return os.path.join(BOT_DIR, path)
 
 def run_command(command):
-    """Run a command and return the result"""
+    """Run a command in the bot directory and return the result"""
     try:
-        result = subprocess.run(command, shell=True, check=True, capture_output=True, text=True)
+        result = subprocess.run(command, shell=True, check=True, capture_output=True, text=True, cwd=BOT_DIR)
         print(f"✓ {command}")
         return True
     except subprocess.CalledProcessError as e:
@@ -18,27 +72,263 @@ def run_command(command):
         print(f"Error: {e.stderr}")
         return False
 
-def main():
+def file_hash(path):
+    """SHA-256 of a file's contents"""
+    with open(bot_path(path), "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def data_sides(path):
+    """Which sides of the model ('nlu', 'core') a training data file feeds"""
+    with open(bot_path(path), encoding="utf-8") as f:
+        content = yaml.safe_load(f) or {}
+    keys = set(content) if isinstance(content, dict) else set()
+    sides = set()
+    if keys & NLU_KEYS:
+        sides.add("nlu")
+    if keys & CORE_KEYS:
+        sides.add("core")
+    return sides
+
+def compute_fingerprint():
+    """Hashes of the config, the domain and each training data file"""
+    data = {}
+    for found in sorted(glob.glob(os.path.join(bot_path(DATA_DIR), "**", "*.yml"), recursive=True)):
+        path = os.path.relpath(found, BOT_DIR)
+        data[path] = {"hash": file_hash(path), "sides": sorted(data_sides(path))}
+    return {
+        "config": file_hash(CONFIG_FILE),
+        "domain": file_hash(DOMAIN_FILE),
+        "data": data,
+    }
+
+def load_previous_fingerprint():
+    try:
+        with open(bot_path(FINGERPRINT_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def latest_model(directory=MODELS_DIR):
+    models = glob.glob(os.path.join(bot_path(directory), "*.tar.gz"))
+    return max(models, key=os.path.getmtime) if models else None
+
+def plan_training(current, previous, force=False):
+    """Decide what to train: returns (stage, reason, changed files)"""
+    if force:
+        return "full", "forced with --force", []
+    if not previous or not previous.get("model") or not os.path.exists(bot_path(previous["model"])):
+        return "full", "no previous model", []
+
+    changed = []
+    if current["config"] != previous.get("config"):
+        changed.append(CONFIG_FILE)
+    if current["domain"] != previous.get("domain"):
+        changed.append(DOMAIN_FILE)
+    if changed:
+        return "full", f"{' and '.join(changed)} changed", changed
+
+    old_data = previous.get("data", {})
+    sides = set()
+    for path in sorted(set(current["data"]) | set(old_data)):
+        new, old = current["data"].get(path), old_data.get(path)
+        if new is None or old is None or new["hash"] != old["hash"]:
+            changed.append(path)
+            sides |= set((new or old)["sides"])
+
+    if not changed:
+        return "skip", "nothing changed since the last training run", []
+    if sides == {"nlu"}:
+        return "nlu", "only NLU data changed", changed
+    if sides == {"core"}:
+        return "core", "only stories/rules changed", changed
+    return "full", "NLU and core data changed", changed
+
+def retrained_components(stage, finetune):
+    """What a training run retrains and where the rest comes from, for the report"""
+    if finetune:
+        return {
+            "retrained": f"all trainable components at a fraction of their epochs ({stage}-only data change)",
+            "reused_from": "the previous model's weights (--finetune)",
+        }
+    if stage == "nlu":
+        retrained = "NLU components only"
+    elif stage == "core":
+        retrained = "core policies only"
+    else:
+        retrained = "all components whose inputs changed"
+    # Same command as a full train; only Rasa's graph cache makes a one-sided plan cheaper
+    return {"retrained": retrained, "reused_from": "Rasa's graph cache (.rasa/cache), same `rasa train` as a full run"}
+
+def build_fast_path_step(model, report, args):
+    """Build the fast path, check it against `model` and write it if the intents agree"""
+    from fast_path import FastPath, build_fast_path, check_parity, parity_texts, write_fast_path
+
+    print("\n⚡ Building the fast path...")
+    started = time.perf_counter()
+    artifact = build_fast_path(threshold=args.fast_path_threshold)
+    fast_path = FastPath(artifact)
+    try:
+        from rasa.core.agent import Agent
+        agent = Agent.load(bot_path(model))
+        parity = asyncio.run(check_parity(fast_path, agent.parse_message, parity_texts()))
+    except Exception as e:
+        parity = None
+        print(f"✗ Could not check the fast path against {model}: {e}")
+    report["stages"]["fast_path"] = round(time.perf_counter() - started, 3)
+
+    ok = parity is not None and parity["agreement"] >= args.fast_path_min_agreement
+    report["fast_path"] = {"written": ok, "parity": parity}
+    if ok:
+        artifact["model"] = os.path.basename(model)
+        write_fast_path(artifact, bot_path(FAST_PATH_PATH))
+        print(f"✓ Fast path for {', '.join(artifact['intents'])}: answers {parity['coverage']:.0%} "
+              f"of the check messages, {parity['agreement']:.1%} agree with the model")
+        return
+    # A stale or inaccurate fast path is worse than none
+    remove_fast_path()
+    if parity is not None:
+        print(f"✗ Fast path agrees with the model on only {parity['agreement']:.1%} of its answers "
+              f"(need {args.fast_path_min_agreement:.1%}); not writing it")
+        for d in parity["disagreements"][:10]:
+            print(f"   • {d['text']!r}: fast path {d['fast_path']}, model {d['full_model']}")
+
+def remove_fast_path():
+    if os.path.exists(bot_path(FAST_PATH_PATH)):
+        os.remove(bot_path(FAST_PATH_PATH))
+        print(f"🗑  Removed {FAST_PATH_PATH}")
+
+def fast_path_outdated(model):
+    from fast_path import data_fingerprint
+    try:
+        with open(bot_path(FAST_PATH_PATH), encoding="utf-8") as f:
+            artifact = json.load(f)
+    except (OSError, ValueError):
+        return True
+    return artifact.get("fingerprint") != data_fingerprint() or artifact.get("model") != os.path.basename(model)
+
+def write_report(report, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📝 Training report written to {path}")
+
+def main(argv=None):
     """Main training function"""
+    parser = argparse.ArgumentParser(description="Train the Vignan University Rasa chatbot")
+    parser.add_argument("--force", action="store_true", help="retrain everything from scratch")
+    parser.add_argument("--finetune", action="store_true",
+                        help="on one-sided changes, finetune every trainable component from the previous model "
+                             "instead of retraining only the changed side")
+    parser.add_argument("--epoch-fraction", type=float, default=0.2,
+                        help="fraction of the configured epochs to use with --finetune (default: 0.2)")
+    parser.add_argument("--report", default=bot_path(REPORT_FILE), help=f"where to write the JSON report (default: {REPORT_FILE} in the bot directory)")
+    parser.add_argument("--sweep", nargs="?", const=bot_path("sweep.yml"), metavar="FILE",
+                        help="instead of training, compare the pipeline variants in FILE "
+                             "(default: sweep.yml in the bot directory)")
+    parser.add_argument("--jobs", type=int, help="variants evaluated in parallel (default: cores / --cores-per-job)")
+    parser.add_argument("--cores-per-job", type=int, default=1, help="CPU cores given to each sweep job")
+    parser.add_argument("--folds", type=int, default=5, help="cross-validation folds per sweep variant")
+    parser.add_argument("--no-fast-path", action="store_true", help="don't build the pre-NLU fast path")
+    parser.add_argument("--fast-path-threshold", type=float, default=0.9,
+                        help="confidence the fast path needs to answer (default: 0.9)")
+    parser.add_argument("--fast-path-min-agreement", type=float, default=0.99,
+                        help="share of fast-path answers that must match the model (default: 0.99)")
+    args = parser.parse_args(argv)
+
+    if args.sweep:
+        from sweep import run_sweep
+        return run_sweep(args.sweep, jobs=args.jobs, cores_per_job=args.cores_per_job, folds=args.folds)
+
     print("🤖 Training Rasa Chatbot for Vignan University...")
     print("=" * 50)
-    
+
+    report = {"started_at": datetime.now().isoformat(timespec="seconds"), "stages": {}, "success": False}
+
+    # Fingerprint the inputs
+    started = time.perf_counter()
+    current = compute_fingerprint()
+    previous = load_previous_fingerprint()
+    stage, reason, changed = plan_training(current, previous, force=args.force)
+    report["stages"]["fingerprint"] = round(time.perf_counter() - started, 3)
+    report["plan"] = {"stage": stage, "reason": reason, "changed": changed}
+    print(f"\n🔍 Plan: {stage} ({reason})")
+    for path in changed:
+        print(f"   • {path}")
+
+    if stage == "skip":
+        report["success"] = True
+        report["model"] = previous["model"]
+        print("\n✅ Model is up to date, nothing to train.")
+        # The model is already live; a running server picks up the rewritten artifact
+        if args.no_fast_path:
+            remove_fast_path()
+        elif fast_path_outdated(previous["model"]):
+            build_fast_path_step(previous["model"], report, args)
+        write_report(report, args.report)
+        return True
+
     # Check if rasa is installed
-    if not run_command("rasa --version"):
+    started = time.perf_counter()
+    installed = run_command("rasa --version")
+    report["stages"]["check_rasa"] = round(time.perf_counter() - started, 3)
+    if not installed:
         print("❌ Rasa is not installed. Please install it first:")
         print("pip install -r requirements.txt")
+        write_report(report, args.report)
         return False
-    
-    # Train the model
-    print("\n📚 Training the model...")
-    if not run_command("rasa train"):
+
+    # Plain `rasa train` reuses the cached components of the unchanged side. Finetuning
+    # changes every component's epochs, so it retrains both sides at reduced epochs.
+    command = f"rasa train --out {STAGING_DIR}"
+    finetune = stage in ("nlu", "core") and args.finetune
+    if finetune:
+        command += f" --finetune {previous['model']} --epoch-fraction {args.epoch_fraction}"
+    report["finetuned"] = finetune
+    report.update(retrained_components(stage, finetune))
+
+    # Leftovers of an interrupted run must not be mistaken for the new model
+    for leftover in glob.glob(os.path.join(bot_path(STAGING_DIR), "*.tar.gz")):
+        os.remove(leftover)
+
+    print(f"\n📚 Training the model ({stage})...")
+    started = time.perf_counter()
+    success = run_command(command)
+    if not success and finetune:
+        # Finetuning is refused when e.g. a new intent or label was added
+        print("↻ Finetuning failed, retraining from scratch...")
+        command = f"rasa train --out {STAGING_DIR}"
+        report["finetuned"] = False
+        report.update(retrained_components(stage, False))
+        success = run_command(command)
+    report["stages"]["train"] = round(time.perf_counter() - started, 3)
+    report["command"] = command
+
+    if not success:
         print("❌ Training failed!")
+        write_report(report, args.report)
         return False
-    
+
+    # Settle the fast path before the model becomes visible to the server's watcher
+    staged = latest_model(STAGING_DIR)
+    if args.no_fast_path:
+        remove_fast_path()
+    else:
+        build_fast_path_step(staged, report, args)
+    current["model"] = os.path.join(MODELS_DIR, os.path.basename(staged))
+    os.replace(staged, bot_path(current["model"]))
+    with open(bot_path(FINGERPRINT_FILE), "w", encoding="utf-8") as f:
+        json.dump(current, f, indent=2)
+    report["model"] = current["model"]
+    report["success"] = True
+
     print("\n✅ Training completed successfully!")
+    print(f"   retrained {report['retrained']}; the rest reused from {report['reused_from']}")
+    for name, seconds in report["stages"].items():
+        print(f"   {name}: {seconds:.2f}s")
+    write_report(report, args.report)
     print("\nTo start the server, run:")
     print("python rasa_server.py")
-    
+
     return True
 
 if __name__ == "__main__":
@@ -0,0 +1,151 @@
+"""
+Pre-fork serving mode for the Rasa chatbot server (`RASA_WORKERS=N`).
+
+Each worker is a separate process with its own event loop and its own loaded
+agent, so TensorFlow inference for different conversations runs on different
+cores. Every worker listens on the same port with SO_REUSEPORT and the kernel
+spreads new connections across them. Workers are spawned rather than forked,
+so no TensorFlow state is inherited. A worker that dies is restarted after an
+exponentially growing delay, and if it keeps dying without staying up (say it
+crashes on startup) the supervisor gives up and stops the whole pool.
+
+Conversation state has to be shared because consecutive webhook messages from
+one user can land on different workers. In-memory stores are therefore
+replaced with the SQLite ones, which work for workers on one machine; Redis
+works across machines. Socket.IO is limited to the websocket transport, which
+keeps a session on the worker that accepted its connection. A message queue
+(`RASA_SOCKETIO_MANAGER_URL`) additionally lets any worker emit to any client.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import signal
+import socket
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL_SECONDS = 1.0
+# Restart delays double from RESTART_DELAY_SECONDS up to MAX_RESTART_DELAY_SECONDS
+RESTART_DELAY_SECONDS = 1.0
+MAX_RESTART_DELAY_SECONDS = 60.0
+# Crashes in a row after which the pool gives up; staying up STABLE_SECONDS resets the count
+MAX_RESTARTS = 5
+STABLE_SECONDS = 60.0
+
+
+def run_worker(index: int, host: str, port: int, settings: Dict[str, Any],
+               agent_factory: Optional[Callable[[], Any]] = None):
+    """Worker process entry point: one server with its own agent on the shared port"""
+    from rasa_server import RasaChatbotServer
+
+    # The parent handles Ctrl+C and stops workers with SIGTERM
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    server = RasaChatbotServer(worker_id=index, **settings)
+    if agent_factory is not None:
+        server.agent = agent_factory()
+        server.prepare_agent(server.agent)
+        server.status = 'healthy'
+    asyncio.run(server.start_server(host, port, load_model=agent_factory is None, reuse_port=True))
+
+
+def shared_settings(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Server settings adjusted so several workers can serve the same conversations"""
+    settings = dict(settings)
+    for store in ('tracker_store', 'lock_store'):
+        if settings.get(store, 'memory') == 'memory':
+            logger.warning(f"{store} 'memory' is per process; using 'sqlite' so workers share conversations")
+            settings[store] = 'sqlite'
+    settings['websocket_only'] = True
+    return settings
+
+
+class WorkerPool:
+    """Starts, supervises and stops the worker processes."""
+
+    def __init__(self, workers: int, host: str, port: int, settings: Dict[str, Any],
+                 agent_factory: Optional[Callable[[], Any]] = None):
+        if not hasattr(socket, 'SO_REUSEPORT'):
+            raise RuntimeError("Several workers need SO_REUSEPORT, which this platform does not support")
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.settings = shared_settings(settings)
+        self.agent_factory = agent_factory
+        self.processes: Dict[int, multiprocessing.Process] = {}
+        self.stopping = False
+        self._started_at: Dict[int, float] = {}
+        self._crashes: Dict[int, int] = {}
+        self._restart_at: Dict[int, float] = {}
+        self._context = multiprocessing.get_context('spawn')
+
+    def _start_worker(self, index: int):
+        process = self._context.Process(
+            target=run_worker, name=f"rasa-worker-{index}",
+            args=(index, self.host, self.port, self.settings, self.agent_factory),
+        )
+        process.start()
+        self.processes[index] = process
+        self._started_at[index] = time.monotonic()
+        logger.info(f"Started worker {index} (pid {process.pid})")
+
+    def start(self):
+        logger.info(f"Starting {self.workers} workers on {self.host}:{self.port}")
+        for index in range(self.workers):
+            self._start_worker(index)
+
+    def supervise(self):
+        """Restart workers that exit until stop() is called"""
+        while not self.stopping:
+            time.sleep(POLL_INTERVAL_SECONDS)
+            self.check_workers()
+
+    def check_workers(self):
+        """Schedule a restart for each worker that exited, and start those that are due.
+
+        Raises RuntimeError once a worker has crashed MAX_RESTARTS times in a row.
+        """
+        now = time.monotonic()
+        for index, process in list(self.processes.items()):
+            if self.stopping or process.is_alive():
+                continue
+            if index not in self._restart_at:
+                crashes = 0 if now - self._started_at[index] >= STABLE_SECONDS else self._crashes.get(index, 0)
+                self._crashes[index] = crashes = crashes + 1
+                if crashes > MAX_RESTARTS:
+                    logger.critical(f"Worker {index} exited with {process.exitcode} {crashes} times in a row; giving up")
+                    raise RuntimeError(f"Worker {index} keeps exiting (last exit code {process.exitcode})")
+                delay = min(RESTART_DELAY_SECONDS * 2 ** (crashes - 1), MAX_RESTART_DELAY_SECONDS)
+                logger.error(f"Worker {index} (pid {process.pid}) exited with {process.exitcode}, "
+                             f"restarting in {delay:.0f}s (crash {crashes} of {MAX_RESTARTS})")
+                self._restart_at[index] = now + delay
+            if now >= self._restart_at[index]:
+                del self._restart_at[index]
+                self._start_worker(index)
+
+    def stop(self):
+        self.stopping = True
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in self.processes.values():
+            process.join()
+
+
+def serve_workers(workers: int, host: str, port: int, settings: Dict[str, Any]):
+    """Run `workers` server processes on one port until SIGINT/SIGTERM"""
+    pool = WorkerPool(workers, host, port, settings)
+
+    def shutdown(signum, frame):
+        pool.stopping = True
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+    pool.start()
+    try:
+        pool.supervise()
+    finally:
+        logger.info("Stopping workers")
+        pool.stop()
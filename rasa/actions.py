@@ -1,19 +1,104 @@
 import os
-import requests
-from typing import Any, Text, Dict, List
+from abc import ABC, abstractmethod
+from typing import Any, Text, Dict, Iterator, List, NamedTuple, Optional
+from urllib.parse import urlencode
 from rasa_sdk import Action, Tracker
+from rasa_sdk.events import SlotSet
 from rasa_sdk.executor import CollectingDispatcher
 
-API_BASE = os.environ.get("NODE_API_BASE", "http://localhost:4000/api")
+from api_client import ApiResponse, client
+
+# Items per chat message for the paged listings; "show more" fetches the next page
+PAGE_SIZE = int(os.environ.get("ACTIONS_PAGE_SIZE", "5"))
+
+# Appended when the Node API is failing and a cached copy is shown instead
+STALE_NOTE = "_(Live data is unavailable right now, so this may be out of date.)_"
+
+class Page(NamedTuple):
+    items: List[Dict[Text, Any]]
+    next_cursor: Optional[Text]
+    stale: bool = False
+
+# Cursors we make up ourselves when the backend sends the whole list
+LOCAL_CURSOR = "offset:"
+
+def _local_offset(cursor: Optional[Text]) -> Optional[int]:
+    if not cursor or not cursor.startswith(LOCAL_CURSOR):
+        return None
+    try:
+        return max(0, int(cursor[len(LOCAL_CURSOR):]))
+    except ValueError:
+        return 0
+
+def _page(r: ApiResponse, cursor: Optional[Text] = None) -> Page:
+    data = r.data if r.ok else None
+    if isinstance(data, dict):
+        return Page(data.get('items') or [], data.get('nextCursor'), r.stale)
+    if isinstance(data, list):
+        # A backend without pagination ignores `limit` and sends the whole list, so page through it here
+        start = _local_offset(cursor) or 0
+        end = start + PAGE_SIZE
+        return Page(data[start:end], f"{LOCAL_CURSOR}{end}" if end < len(data) else None, r.stale)
+    return Page([], None)
+
+class PagedListing(ABC):
+    """Mixin for list actions: fetches one page with only the rendered fields,
+    and keeps the cursor in the `list_*` slots so "show more" can continue."""
+
+    path = ""
+    fields: tuple = ()
+    per_user = False
+    heading = ""
+    empty_text = ""
+    error_text = ""
+
+    @abstractmethod
+    def format_item(self, number: int, item: Dict[Text, Any]) -> Iterator[Text]:
+        """Lines for one item of the listing, numbered from 1 across pages."""
+
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]):
+        return await self.send_page(dispatcher, tracker)
+
+    async def fetch_page(self, tracker: Tracker, cursor: Optional[Text]) -> Page:
+        params = {'fields': ",".join(self.fields), 'limit': PAGE_SIZE}
+        if cursor and _local_offset(cursor) is None:
+            params['cursor'] = cursor
+        path = f"{self.path}?{urlencode(params)}"
+        token = _extract_token(tracker)
+        if self.per_user:
+            return _page(await client.get_for_user(path, token), cursor)
+        return _page(await client.get_public(path, token=token, auth_required=True), cursor)
+
+    async def send_page(self, dispatcher: CollectingDispatcher, tracker: Tracker,
+                        cursor: Optional[Text] = None, shown: int = 0) -> List[Dict[Text, Any]]:
+        try:
+            page = await self.fetch_page(tracker, cursor)
+            if not page.items:
+                dispatcher.utter_message(text="That's everything." if shown else self.empty_text)
+                return _list_slots(None, None, None)
+            lines = [f"{self.heading} (continued)" if shown else self.heading, ""]
+            for number, item in enumerate(page.items, shown + 1):
+                lines.extend(self.format_item(number, item))
+            if page.next_cursor:
+                lines += ["", 'Say "show more" to see the next ones.']
+            if page.stale:
+                lines += ["", STALE_NOTE]
+            dispatcher.utter_message(text="\n".join(lines))
+            if not page.next_cursor:
+                return _list_slots(None, None, None)
+            return _list_slots(self.name(), page.next_cursor, shown + len(page.items))
+        except Exception:
+            dispatcher.utter_message(text=self.error_text)
+            return []
 
 class ActionGetActiveEvents(Action):
     def name(self) -> Text:
         return "action_get_active_events"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]):
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]):
         try:
-            r = requests.get(f"{API_BASE}/events/active", timeout=6)
-            events = r.json() if r.status_code == 200 else []
+            r = await client.get_public("/events/active")
+            events = r.data if r.ok else []
             if not events:
                 dispatcher.utter_message(text="No active events at the moment.")
                 return []
@@ -23,44 +108,40 @@ class ActionGetActiveEvents(Action):
                 if e.get('endAt'): when += f" – {e.get('endAt')}"
                 location = f" @ {e.get('location')}" if e.get('location') else ''
                 lines.append(f"{i}. **{e.get('title','Event')}** — {when}{location}")
+            if r.stale:
+                lines += ["", STALE_NOTE]
             dispatcher.utter_message(text="\n".join(lines))
         except Exception:
             dispatcher.utter_message(text="Sorry, I couldn't fetch events right now.")
         return []
 
-class ActionGetActivePolls(Action):
+class ActionGetActivePolls(PagedListing, Action):
+    path = "/polls"
+    fields = ("title", "options.text")
+    heading = "**Active Polls:**"
+    empty_text = "No active polls available right now."
+    error_text = "Sorry, I couldn't fetch polls right now."
+
     def name(self) -> Text:
         return "action_get_active_polls"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]):
-        try:
-            r = requests.get(f"{API_BASE}/polls", timeout=6, headers=_auth_header(tracker))
-            polls = r.json() if r.status_code == 200 else []
-            if not polls:
-                dispatcher.utter_message(text="No active polls available right now.")
-                return []
-            lines = ["**Active Polls:**", ""]
-            for i, p in enumerate(polls, 1):
-                lines.append(f"{i}. **{p.get('title','Poll')}**")
-                for j, opt in enumerate(p.get('options', []), 1):
-                    roman = _to_roman(j)
-                    lines.append(f"   {roman}. {opt.get('text','Option')}")
-            dispatcher.utter_message(text="\n".join(lines))
-        except Exception:
-            dispatcher.utter_message(text="Sorry, I couldn't fetch polls right now.")
-        return []
+    def format_item(self, number: int, p: Dict[Text, Any]) -> Iterator[Text]:
+        yield f"{number}. **{p.get('title','Poll')}**"
+        for j, opt in enumerate(p.get('options', []), 1):
+            roman = _to_roman(j)
+            yield f"   {roman}. {opt.get('text','Option')}"
 
 class ActionGetMyProfile(Action):
     def name(self) -> Text:
         return "action_get_my_profile"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]):
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]):
         try:
-            r = requests.get(f"{API_BASE}/me/profile", timeout=6, headers=_auth_header(tracker))
-            if r.status_code != 200:
+            r = await client.get_for_user("/me/profile", _extract_token(tracker))
+            if not r.ok:
                 dispatcher.utter_message(text="Profile not found or not logged in.")
                 return []
-            user = r.json().get('user', {})
+            user = (r.data or {}).get('user', {})
             lines = [
                 "**Your Profile**",
                 "",
@@ -75,61 +156,65 @@ class ActionGetMyProfile(Action):
             dispatcher.utter_message(text="Sorry, I couldn't fetch your profile.")
         return []
 
-class ActionGetMyIdeas(Action):
+class ActionGetMyIdeas(PagedListing, Action):
+    path = "/me/ideas"
+    fields = ("data.title", "data.ideaTitle", "data.status")
+    per_user = True
+    heading = "**Your Idea Submissions:**"
+    empty_text = "You have no idea submissions yet."
+    error_text = "Sorry, I couldn't fetch your ideas."
+
     def name(self) -> Text:
         return "action_get_my_ideas"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]):
-        try:
-            r = requests.get(f"{API_BASE}/me/ideas", timeout=6, headers=_auth_header(tracker))
-            items = r.json() if r.status_code == 200 else []
-            if not items:
-                dispatcher.utter_message(text="You have no idea submissions yet.")
-                return []
-            lines = ["**Your Idea Submissions:**", ""]
-            for i, it in enumerate(items, 1):
-                data = it.get('data', {})
-                title = data.get('title') or data.get('ideaTitle') or 'Idea'
-                status = data.get('status', 'submitted')
-                lines.append(f"{i}. **{title}** — Status: {status}")
-            dispatcher.utter_message(text="\n".join(lines))
-        except Exception:
-            dispatcher.utter_message(text="Sorry, I couldn't fetch your ideas.")
-        return []
+    def format_item(self, number: int, it: Dict[Text, Any]) -> Iterator[Text]:
+        data = it.get('data', {})
+        title = data.get('title') or data.get('ideaTitle') or 'Idea'
+        status = data.get('status', 'submitted')
+        yield f"{number}. **{title}** — Status: {status}"
+
+class ActionGetMyAchievements(PagedListing, Action):
+    path = "/me/achievements"
+    fields = ("eventName", "eventType", "dateOfParticipation")
+    per_user = True
+    heading = "**Your Achievements:**"
+    empty_text = "No achievements submitted yet."
+    error_text = "Sorry, I couldn't fetch your achievements."
 
-class ActionGetMyAchievements(Action):
     def name(self) -> Text:
         return "action_get_my_achievements"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]):
-        try:
-            r = requests.get(f"{API_BASE}/me/achievements", timeout=6, headers=_auth_header(tracker))
-            items = r.json() if r.status_code == 200 else []
-            if not items:
-                dispatcher.utter_message(text="No achievements submitted yet.")
-                return []
-            lines = ["**Your Achievements:**", ""]
-            for i, a in enumerate(items, 1):
-                when = a.get('dateOfParticipation','')
-                title = a.get('eventName') or a.get('title') or 'Achievement'
-                etype = a.get('eventType','')
-                lines.append(f"{i}. **{title}** — {etype} {when}")
-            dispatcher.utter_message(text="\n".join(lines))
-        except Exception:
-            dispatcher.utter_message(text="Sorry, I couldn't fetch your achievements.")
-        return []
+    def format_item(self, number: int, a: Dict[Text, Any]) -> Iterator[Text]:
+        when = a.get('dateOfParticipation','')
+        title = a.get('eventName') or a.get('title') or 'Achievement'
+        etype = a.get('eventType','')
+        yield f"{number}. **{title}** — {etype} {when}"
 
-# Helpers
+# Listings that "show more" can continue, by action name
+LISTINGS = {listing.name(): listing for listing in (ActionGetActivePolls(), ActionGetMyIdeas(), ActionGetMyAchievements())}
 
-def _auth_header(tracker: Tracker) -> Dict[str, str]:
-    token = _extract_token(tracker)
-    return {"Authorization": f"Bearer {token}"} if token else {}
+class ActionShowMore(Action):
+    def name(self) -> Text:
+        return "action_show_more"
+
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]):
+        listing = LISTINGS.get(tracker.get_slot('list_action'))
+        cursor = tracker.get_slot('list_cursor')
+        if not listing or not cursor:
+            dispatcher.utter_message(text="There's nothing more to show.")
+            return []
+        return await listing.send_page(dispatcher, tracker, cursor, int(tracker.get_slot('list_shown') or 0))
+
+# Helpers
 
 def _extract_token(tracker: Tracker) -> str:
     # Expect token in slot 'auth_token' or metadata (adjust as per your integration)
     token = (tracker.get_slot('auth_token') or '').strip()
     return token
 
+def _list_slots(action: Optional[Text], cursor: Optional[Text], shown: Optional[int]) -> List[Dict[Text, Any]]:
+    return [SlotSet('list_action', action), SlotSet('list_cursor', cursor), SlotSet('list_shown', shown)]
+
 def _to_roman(n: int) -> str:
     mapping = ['I','II','III','IV','V','VI','VII','VIII','IX','X']
     return mapping[n-1] if 1 <= n <= 10 else str(n)
@@ -0,0 +1,476 @@
+"""
+Shared HTTP client for the custom actions.
+
+All actions talk to the Node backend through one pooled, non-blocking
+aiohttp session, so a slow API response only suspends the conversation that
+is waiting for it. Public listings are kept in a shared TTL cache with
+single-flight loading, so a burst of identical questions results in a single
+upstream request, and per-user endpoints get a short cache keyed on the
+caller's token.
+
+Each endpoint has a circuit breaker: after repeated failures calls fail fast
+instead of waiting out their timeouts, and one trial request is let through
+after a cool-down. Failed requests are retried with jittered backoff as long as
+the action's latency budget allows. When `/events/active` or `/polls` cannot be
+refreshed, the last good response is served marked as stale while a
+background request revalidates it.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import random
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Text
+
+import aiohttp
+
+API_BASE = os.environ.get("NODE_API_BASE", "http://localhost:4000/api")
+REQUEST_TIMEOUT = float(os.environ.get("ACTIONS_HTTP_TIMEOUT", "6"))
+POOL_SIZE = int(os.environ.get("ACTIONS_HTTP_POOL_SIZE", "20"))
+MAX_CONCURRENCY = int(os.environ.get("ACTIONS_HTTP_MAX_CONCURRENCY", "50"))
+PUBLIC_CACHE_TTL = float(os.environ.get("ACTIONS_PUBLIC_CACHE_TTL", "30"))
+USER_CACHE_TTL = float(os.environ.get("ACTIONS_USER_CACHE_TTL", "5"))
+TOKEN_TRUST_TTL = float(os.environ.get("ACTIONS_TOKEN_TRUST_TTL", "60"))
+STATS_LOG_INTERVAL = float(os.environ.get("ACTIONS_CACHE_STATS_INTERVAL", "300"))
+MAX_STALE = float(os.environ.get("ACTIONS_MAX_STALE", "3600"))
+LATENCY_BUDGET = float(os.environ.get("ACTIONS_LATENCY_BUDGET", "4"))
+MAX_RETRIES = int(os.environ.get("ACTIONS_HTTP_RETRIES", "2"))
+RETRY_BACKOFF = float(os.environ.get("ACTIONS_HTTP_RETRY_BACKOFF", "0.1"))
+BREAKER_FAILURES = int(os.environ.get("ACTIONS_BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.environ.get("ACTIONS_BREAKER_RESET", "30"))
+METRICS_PORT = int(os.environ.get("ACTIONS_METRICS_PORT", "0"))
+METRICS_HOST = os.environ.get("ACTIONS_METRICS_HOST", "127.0.0.1")
+
+# Don't start an attempt with less time than this left in the budget
+MIN_ATTEMPT_SECONDS = 0.2
+
+# Per-endpoint total timeouts in seconds; anything not listed uses REQUEST_TIMEOUT
+ENDPOINT_TIMEOUTS: Dict[Text, float] = {
+    "/events/active": 3.0,
+    "/polls": 3.0,
+    "/me/profile": 2.0,
+    "/me/ideas": 3.0,
+    "/me/achievements": 3.0,
+}
+
+logger = logging.getLogger(__name__)
+
+
+class ApiResponse(NamedTuple):
+    status: int
+    data: Any
+    # True when this is a cached copy served because the Node API could not be reached
+    stale: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.status == 200
+
+
+class TTLCache:
+    """Bounded TTL cache that coalesces concurrent loads of the same key."""
+
+    def __init__(self, name: Text, ttl: float, max_entries: int = 1024, max_stale: float = 0.0):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # How long past its TTL an entry may still be served when the upstream is failing
+        self.max_stale = max_stale
+        self._entries: "OrderedDict[Text, tuple]" = OrderedDict()
+        self._flights: Dict[Text, "asyncio.Future[ApiResponse]"] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.stale_served = 0
+
+    async def get_or_load(self, key: Text, loader: Callable[[], Awaitable[ApiResponse]],
+                          prefer_stale: bool = False) -> ApiResponse:
+        """Cached value, or the result of `loader` (shared by concurrent callers).
+
+        If the load fails, the last good value is returned marked as stale. With
+        `prefer_stale` (the upstream is known to be failing) it is returned right
+        away and the load continues in the background.
+        """
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry and entry[0] > now:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        stale = entry[1]._replace(stale=True) if entry and entry[0] + self.max_stale > now else None
+
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            flight = self._flights[key] = asyncio.ensure_future(self._load(key, loader))
+            # Nobody may be waiting for a background revalidation; don't leave its error unretrieved
+            flight.add_done_callback(lambda f: f.cancelled() or f.exception())
+        if stale is not None and prefer_stale:
+            self.stale_served += 1
+            return stale
+        try:
+            # Shield so a cancelled caller doesn't cancel the load for everyone else
+            result = await asyncio.shield(flight)
+        except (aiohttp.ClientError, asyncio.TimeoutError, CircuitOpenError):
+            if stale is None:
+                raise
+            result = None
+        if stale is not None and (result is None or result.status >= 500):
+            self.stale_served += 1
+            return stale
+        return result
+
+    async def _load(self, key: Text, loader: Callable[[], Awaitable[ApiResponse]]) -> ApiResponse:
+        try:
+            result = await loader()
+            self.put(key, result)
+            return result
+        finally:
+            self._flights.pop(key, None)
+
+    def put(self, key: Text, result: ApiResponse):
+        # Only successful responses are worth keeping around
+        if result.ok and self.ttl > 0:
+            self._entries[key] = (time.monotonic() + self.ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[Text, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "name": self.name,
+            "ttl": self.ttl,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "stale_served": self.stale_served,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Per-endpoint breaker: closed -> open after repeated failures -> half-open trial -> closed."""
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+    def __init__(self, endpoint: Text, failure_threshold: int = BREAKER_FAILURES,
+                 reset_timeout: float = BREAKER_RESET):
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        """Whether a request may go out now (in half-open state, only the single trial).
+
+        A trial that hasn't reported back within `reset_timeout` is given up on,
+        and the next call becomes a new trial.
+        """
+        if self.state == self.CLOSED:
+            return True
+        # opened_at is also when the current trial started
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self.opened_at = time.monotonic()
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+                logger.warning(f"Circuit breaker for {self.endpoint} opened after {self.failures} failure(s)")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[Text, Any]:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+
+
+class NodeApiClient:
+    """Pooled, cached access to the Node `/api` endpoints used by the actions."""
+
+    def __init__(self, base_url: Text = API_BASE, timeout: float = REQUEST_TIMEOUT,
+                 pool_size: int = POOL_SIZE, max_concurrency: int = MAX_CONCURRENCY,
+                 public_ttl: float = PUBLIC_CACHE_TTL, user_ttl: float = USER_CACHE_TTL,
+                 endpoint_timeouts: Optional[Dict[Text, float]] = None, max_stale: float = MAX_STALE,
+                 latency_budget: float = LATENCY_BUDGET, retries: int = MAX_RETRIES,
+                 retry_backoff: float = RETRY_BACKOFF, metrics_port: int = METRICS_PORT,
+                 metrics_host: Text = METRICS_HOST):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.max_concurrency = max_concurrency
+        self.endpoint_timeouts = dict(ENDPOINT_TIMEOUTS if endpoint_timeouts is None else endpoint_timeouts)
+        self.latency_budget = latency_budget
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.retried = 0
+        self.breakers: Dict[Text, CircuitBreaker] = {}
+        # Only the public listings are worth showing out of date; per-user data is not kept stale
+        self.public_cache = TTLCache("public", public_ttl, max_stale=max_stale)
+        self.user_cache = TTLCache("user", user_ttl, max_entries=4096)
+        # Hashes of login tokens Node accepted recently, which may be served the shared copy
+        self._trusted_tokens: "OrderedDict[Text, float]" = OrderedDict()
+        self.metrics_port = metrics_port
+        self.metrics_host = metrics_host
+        # Set before the server task runs, so it is only ever started once
+        self._metrics_started = False
+        self._metrics_runner = None
+        # Created lazily: both must belong to the action server's running loop
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._last_stats_log = time.monotonic()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=30)
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            if self.metrics_port and not self._metrics_started:
+                self._metrics_started = True
+                asyncio.ensure_future(self._start_metrics_server())
+        return self._session
+
+    @staticmethod
+    def endpoint(path: Text) -> Text:
+        return path.split("?", 1)[0]
+
+    def timeout_for(self, path: Text) -> float:
+        return self.endpoint_timeouts.get(self.endpoint(path), self.timeout)
+
+    def breaker_for(self, path: Text) -> CircuitBreaker:
+        endpoint = self.endpoint(path)
+        if endpoint not in self.breakers:
+            self.breakers[endpoint] = CircuitBreaker(endpoint)
+        return self.breakers[endpoint]
+
+    async def _get(self, path: Text, token: Text, timeout: float) -> ApiResponse:
+        """One GET; `timeout` covers waiting for a concurrency slot as well as the request."""
+        return await asyncio.wait_for(self._request(path, token), timeout)
+
+    async def _request(self, path: Text, token: Text) -> ApiResponse:
+        session = self._get_session()
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        async with self._semaphore:
+            async with session.get(f"{self.base_url}{path}", headers=headers) as r:
+                try:
+                    data = await r.json(content_type=None)
+                except ValueError:
+                    data = None
+                return ApiResponse(r.status, data)
+
+    async def fetch(self, path: Text, token: Text = "") -> ApiResponse:
+        """Uncached GET; returns the status and decoded JSON body (None if not JSON).
+
+        Connection errors, timeouts and 5xx answers are retried with jittered
+        exponential backoff while the latency budget allows, and count as one
+        failure for the endpoint's breaker. Raises CircuitOpenError without
+        calling out while the breaker is open.
+        """
+        breaker = self.breaker_for(path)
+        if not breaker.allow():
+            raise CircuitOpenError(f"{self.endpoint(path)} is failing, not calling it for now")
+        deadline = time.monotonic() + self.latency_budget
+        attempt = 0
+        recorded = False
+        try:
+            while True:
+                error: Optional[Exception] = None
+                result: Optional[ApiResponse] = None
+                try:
+                    result = await self._get(path, token, min(self.timeout_for(path), deadline - time.monotonic()))
+                    if result.status < 500:
+                        recorded = True
+                        breaker.record_success()
+                        return result
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    error = e
+                attempt += 1
+                delay = random.uniform(0, self.retry_backoff * 2 ** attempt)
+                if attempt > self.retries or deadline - time.monotonic() - delay < MIN_ATTEMPT_SECONDS:
+                    recorded = True
+                    breaker.record_failure()
+                    if error is not None:
+                        raise error
+                    return result
+                self.retried += 1
+                await asyncio.sleep(delay)
+        finally:
+            # Cancellation or an unexpected error still has to settle a half-open trial
+            if not recorded and breaker.state == CircuitBreaker.HALF_OPEN:
+                breaker.record_failure()
+
+    @staticmethod
+    def _token_key(token: Text) -> Text:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def _is_trusted(self, token: Text) -> bool:
+        expires = self._trusted_tokens.get(self._token_key(token))
+        return expires is not None and expires > time.monotonic()
+
+    def _trust(self, token: Text, accepted: bool):
+        key = self._token_key(token)
+        self._trusted_tokens.pop(key, None)
+        if accepted and TOKEN_TRUST_TTL > 0:
+            self._trusted_tokens[key] = time.monotonic() + TOKEN_TRUST_TTL
+            while len(self._trusted_tokens) > self.user_cache.max_entries:
+                self._trusted_tokens.popitem(last=False)
+
+    async def get_public(self, path: Text, token: Text = "", auth_required: bool = False) -> ApiResponse:
+        """GET a listing that is the same for every student, through the shared cache.
+
+        Some of these routes (e.g. `/polls`) still require a login. Callers without
+        a token bypass the cache. A token Node hasn't accepted within the last
+        ACTIONS_TOKEN_TRUST_TTL seconds gets its own request (which refreshes the
+        cache when it succeeds) rather than the shared copy. A caller whose shared
+        request was rejected for another student's token retries with its own.
+        """
+        if auth_required and not token:
+            return await self.fetch(path)
+        self.maybe_log_stats()
+        if auth_required and not self._is_trusted(token):
+            return await self._fetch_as(path, token)
+
+        loaded_here = False
+
+        async def load() -> ApiResponse:
+            nonlocal loaded_here
+            loaded_here = True
+            return await self.fetch(path, token)
+
+        # While the endpoint is failing, answer from the last good copy and revalidate behind it
+        prefer_stale = self.breaker_for(path).state != CircuitBreaker.CLOSED
+        result = await self.public_cache.get_or_load(path, load, prefer_stale)
+        # A stale copy means Node never saw this token, so it doesn't renew trust
+        if auth_required and loaded_here and result.ok and not result.stale:
+            self._trust(token, True)
+        if auth_required and result.status in (401, 403):
+            if loaded_here:
+                self._trust(token, False)
+                return result
+            return await self._fetch_as(path, token)
+        return result
+
+    async def _fetch_as(self, path: Text, token: Text) -> ApiResponse:
+        """Fetch an auth-required public listing with the caller's own token"""
+        result = await self.fetch(path, token)
+        if result.ok or result.status in (401, 403):
+            self._trust(token, result.ok)
+        if result.ok:
+            self.public_cache.put(path, result)
+        return result
+
+    async def get_for_user(self, path: Text, token: Text) -> ApiResponse:
+        """GET a per-user endpoint (`/me/*`), cached briefly per token."""
+        if not token:
+            return await self.fetch(path)
+        self.maybe_log_stats()
+        key = f"{self._token_key(token)}:{path}"
+        return await self.user_cache.get_or_load(key, lambda: self.fetch(path, token))
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        if self._metrics_runner is not None:
+            await self._metrics_runner.cleanup()
+            self._metrics_runner = None
+        self._metrics_started = False
+
+    def stats(self) -> Dict[Text, Any]:
+        return {
+            "public": self.public_cache.stats(),
+            "user": self.user_cache.stats(),
+            "retries": self.retried,
+            "breakers": {endpoint: breaker.stats() for endpoint, breaker in self.breakers.items()},
+        }
+
+    def render_metrics(self) -> Text:
+        """Breaker, retry and cache counters in the Prometheus text format."""
+        states = {CircuitBreaker.CLOSED: 0, CircuitBreaker.HALF_OPEN: 1, CircuitBreaker.OPEN: 2}
+        lines: List[Text] = []
+
+        def metric(name: Text, kind: Text, help_text: Text, samples: Dict[Text, float]):
+            lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"])
+            lines.extend(f"{name}{labels} {value}" for labels, value in samples.items())
+
+        breakers = sorted(self.breakers.items())
+        metric("actions_api_breaker_state", "gauge", "Circuit breaker state (0 closed, 1 half-open, 2 open)",
+               {f'{{endpoint="{e}"}}': states[b.state] for e, b in breakers})
+        metric("actions_api_breaker_opened_total", "counter", "Times the breaker opened",
+               {f'{{endpoint="{e}"}}': b.times_opened for e, b in breakers})
+        metric("actions_api_breaker_rejected_total", "counter", "Calls failed fast by an open breaker",
+               {f'{{endpoint="{e}"}}': b.rejected for e, b in breakers})
+        metric("actions_api_retries_total", "counter", "Retried Node API requests", {"": self.retried})
+        caches = (self.public_cache, self.user_cache)
+        metric("actions_api_stale_served_total", "counter", "Stale responses served while the API was failing",
+               {f'{{cache="{c.name}"}}': c.stale_served for c in caches})
+        metric("actions_api_cache_hits_total", "counter", "Cache hits, including coalesced loads",
+               {f'{{cache="{c.name}"}}': c.hits + c.coalesced for c in caches})
+        metric("actions_api_cache_misses_total", "counter", "Cache misses",
+               {f'{{cache="{c.name}"}}': c.misses for c in caches})
+        return "\n".join(lines) + "\n"
+
+    async def _start_metrics_server(self):
+        """Serve render_metrics() on ACTIONS_METRICS_PORT from the action server's loop.
+
+        A port that can't be bound only costs the metrics, not the actions.
+        """
+        from aiohttp import web
+
+        async def handler(request: web.Request) -> web.Response:
+            return web.Response(text=self.render_metrics(),
+                                headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+        app = web.Application()
+        app.router.add_get("/metrics", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, self.metrics_host, self.metrics_port).start()
+        except OSError as e:
+            await runner.cleanup()
+            logger.warning(f"Could not serve Node API client metrics on {self.metrics_host}:{self.metrics_port}: {e}")
+            return
+        self._metrics_runner = runner
+        logger.info(f"Node API client metrics on {self.metrics_host}:{self.metrics_port}/metrics")
+
+    def maybe_log_stats(self):
+        """Log cache counters every STATS_LOG_INTERVAL seconds (for sizing the TTLs)."""
+        now = time.monotonic()
+        if STATS_LOG_INTERVAL <= 0 or now - self._last_stats_log < STATS_LOG_INTERVAL:
+            return
+        self._last_stats_log = now
+        logger.info(f"Node API client stats: {self.stats()}")
+
+
+client = NodeApiClient()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Load benchmark for the Node-backed custom actions.
+
+Starts the local stub of the Node `/api` endpoints shared with the chatbot
+benchmarks (rasa-chatbot/benchmarks/stubs.py, with configurable latency) and
+drives the actions at a fixed concurrency, comparing the old blocking
+`requests` implementation with the async actions in `actions.py`.
+
+    python benchmarks/bench_actions.py --requests 500 --concurrency 50 --latency-ms 40
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Text
+
+import requests
+from aiohttp import web
+
+ACTIONS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ACTIONS_DIR)
+# Appended, so this directory's `actions` module still wins over rasa-chatbot's
+sys.path.append(os.path.join(os.path.dirname(ACTIONS_DIR), "rasa-chatbot"))
+
+import actions  # noqa: E402
+from api_client import NodeApiClient  # noqa: E402
+from benchmarks.stubs import build_node_api_app  # noqa: E402
+from rasa_sdk import Tracker  # noqa: E402
+from rasa_sdk.executor import CollectingDispatcher  # noqa: E402
+
+ENDPOINTS = {
+    "action_get_active_events": "/events/active",
+    "action_get_active_polls": "/polls",
+    "action_get_my_profile": "/me/profile",
+    "action_get_my_ideas": "/me/ideas",
+    "action_get_my_achievements": "/me/achievements",
+}
+
+ACTIONS = [
+    actions.ActionGetActiveEvents(),
+    actions.ActionGetActivePolls(),
+    actions.ActionGetMyProfile(),
+    actions.ActionGetMyIdeas(),
+    actions.ActionGetMyAchievements(),
+]
+
+
+def start_stub(port: int, latency_ms: float, jitter_ms: float) -> threading.Thread:
+    """Serve the stub from its own thread/loop so blocking clients can't stall it."""
+    ready = threading.Event()
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        runner = web.AppRunner(build_node_api_app(latency_ms, jitter_ms))
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", port).start())
+        ready.set()
+        loop.run_forever()
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    ready.wait()
+    return thread
+
+
+def make_tracker(sender_id: Text) -> Tracker:
+    return Tracker.from_dict({
+        "sender_id": sender_id,
+        "slots": {"auth_token": f"token-{sender_id}"},
+        "latest_message": {},
+        "events": [],
+        "paused": False,
+        "followup_action": None,
+        "active_loop": {},
+        "latest_action_name": None,
+    })
+
+
+def legacy_run(base_url: Text, action_name: Text, token: Text) -> Any:
+    """What every action used to do: a fresh blocking request with a 6s timeout."""
+    headers = {"Authorization": f"Bearer {token}"}
+    r = requests.get(f"{base_url}{ENDPOINTS[action_name]}", timeout=6, headers=headers)
+    return r.json() if r.status_code == 200 else []
+
+
+async def drive(mode: Text, base_url: Text, total: int, concurrency: int) -> Dict[Text, Any]:
+    """Fire requests in waves of `concurrency` simultaneous conversations.
+
+    Latency is measured from the moment the wave arrives, so time spent queued
+    behind a blocked event loop counts against the blocking implementation.
+    """
+    latencies: List[float] = []
+
+    async def one(i: int, arrived: float):
+        action = ACTIONS[i % len(ACTIONS)]
+        tracker = make_tracker(f"user{i % 200}")
+        if mode == "blocking":
+            # rasa_sdk runs a synchronous `run` directly on its event loop
+            legacy_run(base_url, action.name(), tracker.get_slot("auth_token"))
+        else:
+            await action.run(CollectingDispatcher(), tracker, {})
+        latencies.append(time.perf_counter() - arrived)
+
+    started = time.perf_counter()
+    for wave in range(0, total, concurrency):
+        arrived = time.perf_counter()
+        await asyncio.gather(*(one(i, arrived) for i in range(wave, min(total, wave + concurrency))))
+    wall = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "mode": mode,
+        "requests": total,
+        "concurrency": concurrency,
+        "actions_per_sec": round(total / wall, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 2),
+    }
+
+
+async def run_async_mode(mode: Text, base_url: Text, args) -> Dict[Text, Any]:
+    ttl = 30 if mode == "async+cache" else 0
+    actions.client = NodeApiClient(base_url=base_url, public_ttl=ttl, user_ttl=ttl)
+    try:
+        return await drive(mode, base_url, args.requests, args.concurrency)
+    finally:
+        await actions.client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=40.0, help="stub API latency")
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--port", type=int, default=4999)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    start_stub(args.port, args.latency_ms, args.jitter_ms)
+    base_url = f"http://127.0.0.1:{args.port}/api"
+
+    results = [asyncio.run(drive("blocking", base_url, args.requests, args.concurrency))]
+    for mode in ("async", "async+cache"):
+        results.append(asyncio.run(run_async_mode(mode, base_url, args)))
+
+    print(f"{'mode':<14}{'actions/sec':>14}{'p50 ms':>10}{'p99 ms':>10}")
+    for r in results:
+        print(f"{r['mode']:<14}{r['actions_per_sec']:>14}{r['p50_ms']:>10}{r['p99_ms']:>10}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
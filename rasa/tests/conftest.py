@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The action server runs from rasa/, and the modules import each other by name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# rasa-chatbot/ has an actions.py too; import ours before its tests put that directory first on the path
+import actions  # noqa: E402,F401
@@ -0,0 +1,108 @@
+import asyncio
+
+from rasa_sdk import Tracker
+from rasa_sdk.executor import CollectingDispatcher
+
+import actions
+from api_client import ApiResponse, NodeApiClient
+
+POLLS = [{"title": f"Poll {i}", "options": [{"text": "Yes"}, {"text": "No"}]} for i in range(12)]
+
+
+def make_tracker(**slots) -> Tracker:
+    return Tracker.from_dict({
+        "sender_id": "student",
+        "slots": {"auth_token": "token", **slots},
+        "latest_message": {},
+        "events": [],
+        "paused": False,
+        "followup_action": None,
+        "active_loop": {},
+        "latest_action_name": None,
+    })
+
+
+def test_plain_list_is_paged_locally():
+    response = ApiResponse(200, POLLS)
+    first = actions._page(response)
+    assert first.items == POLLS[:5] and first.next_cursor == "offset:5"
+    last = actions._page(response, "offset:10")
+    assert last.items == POLLS[10:] and last.next_cursor is None
+
+
+def test_local_cursor_boundaries():
+    assert actions._page(ApiResponse(200, POLLS[:5])).next_cursor is None
+    assert actions._page(ApiResponse(200, POLLS), "offset:12").items == []
+    assert actions._page(ApiResponse(200, POLLS), "offset:junk").items == POLLS[:5]
+    assert actions._local_offset("offset:-3") == 0
+    # Node's own cursors aren't ours to interpret
+    assert actions._local_offset("abc123") is None
+
+
+def test_paged_response_is_passed_through():
+    page = actions._page(ApiResponse(200, {"items": POLLS[:5], "nextCursor": "abc"}))
+    assert page.items == POLLS[:5] and page.next_cursor == "abc"
+    assert actions._page(ApiResponse(500, None)).items == []
+
+
+def test_local_cursor_is_not_sent_to_node(monkeypatch):
+    paths = []
+    client = NodeApiClient(base_url="http://node.test/api", retries=0)
+
+    async def get(path, token, timeout):
+        paths.append(path)
+        return ApiResponse(200, POLLS)
+
+    client._get = get
+    monkeypatch.setattr(actions, "client", client)
+    listing = actions.ActionGetMyIdeas()
+    asyncio.run(listing.fetch_page(make_tracker(), "offset:5"))
+    asyncio.run(listing.fetch_page(make_tracker(), "abc"))
+    assert "cursor" not in paths[0]
+    assert "cursor=abc" in paths[1]
+
+
+def run_action(action, tracker):
+    """Messages the action sent and the tracker with its slot events applied."""
+    dispatcher = CollectingDispatcher()
+    events = asyncio.run(action.run(dispatcher, tracker, {}))
+    slots = {**tracker.slots, **{e["name"]: e["value"] for e in events if e["event"] == "slot"}}
+    return [m["text"] for m in dispatcher.messages], make_tracker(**slots)
+
+
+def polls_client(monkeypatch, polls):
+    """Client whose Node API returns `polls` as a plain list, so the actions page it locally."""
+    client = NodeApiClient(base_url="http://node.test/api", retries=0, public_ttl=0)
+
+    async def get(path, token, timeout):
+        return ApiResponse(200, list(polls))
+
+    client._get = get
+    monkeypatch.setattr(actions, "client", client)
+
+
+def test_show_more_walks_a_listing_to_its_end(monkeypatch):
+    polls_client(monkeypatch, POLLS)
+    texts, tracker = run_action(actions.ActionGetActivePolls(), make_tracker())
+    assert "1. **Poll 0**" in texts[0] and 'Say "show more"' in texts[0]
+    assert tracker.get_slot("list_cursor") == "offset:5"
+
+    texts, tracker = run_action(actions.ActionShowMore(), tracker)
+    assert "(continued)" in texts[0] and "6. **Poll 5**" in texts[0]
+    texts, tracker = run_action(actions.ActionShowMore(), tracker)
+    assert "11. **Poll 10**" in texts[0] and 'Say "show more"' not in texts[0]
+    assert tracker.get_slot("list_cursor") is None
+
+    texts, _ = run_action(actions.ActionShowMore(), tracker)
+    assert texts == ["There's nothing more to show."]
+
+
+def test_show_more_after_the_listing_shrank(monkeypatch):
+    polls = list(POLLS)
+    polls_client(monkeypatch, polls)
+    _, tracker = run_action(actions.ActionGetActivePolls(), make_tracker())
+    # Polls closed before the user asked for more
+    del polls[5:]
+    texts, tracker = run_action(actions.ActionShowMore(), tracker)
+    assert texts == ["That's everything."]
+    assert tracker.get_slot("list_action") is None and tracker.get_slot("list_cursor") is None
@@ -0,0 +1,357 @@
+import asyncio
+
+import aiohttp
+import pytest
+
+import api_client
+from api_client import ApiResponse, CircuitBreaker, CircuitOpenError, NodeApiClient, TTLCache
+
+POLLS = [{"title": "Poll 0"}]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Manual monotonic clock for the breaker; only for tests that don't run an event loop."""
+    now = [1000.0]
+    monkeypatch.setattr(api_client.time, "monotonic", lambda: now[0])
+    return now
+
+
+def make_client(handler, **kwargs):
+    """Client whose HTTP layer is `handler(path, token)`; returns it with the list of calls made."""
+    client = NodeApiClient(base_url="http://node.test/api", retries=0, **kwargs)
+    calls = []
+
+    async def get(path, token, timeout):
+        calls.append((path, token))
+        return await handler(path, token)
+
+    client._get = get
+    return client, calls
+
+
+def ok(data=POLLS) -> ApiResponse:
+    return ApiResponse(200, data)
+
+
+async def always_ok(path, token):
+    return ok()
+
+
+# Circuit breaker
+
+def test_breaker_opens_after_repeated_failures():
+    breaker = CircuitBreaker("/polls", failure_threshold=3, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.rejected == 1 and breaker.times_opened == 1
+
+
+def test_breaker_half_open_trial_closes_it_on_success(clock):
+    breaker = CircuitBreaker("/polls", failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock[0] += 29
+    assert not breaker.allow()
+    clock[0] += 1
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Only the one trial goes out
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.failures == 0
+    assert breaker.allow()
+
+
+def test_breaker_failed_trial_reopens_it(clock):
+    breaker = CircuitBreaker("/polls", failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and breaker.times_opened == 2
+    assert not breaker.allow()
+
+
+def test_breaker_gives_up_on_a_trial_that_never_reports_back(clock):
+    breaker = CircuitBreaker("/polls", failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock[0] += 30
+    assert breaker.allow()
+    clock[0] += 29
+    assert not breaker.allow()
+    clock[0] += 1
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_fetch_fails_fast_once_the_breaker_opens():
+    async def unavailable(path, token):
+        return ApiResponse(503, None)
+
+    client, calls = make_client(unavailable)
+    client.breakers["/polls"] = CircuitBreaker("/polls", failure_threshold=2, reset_timeout=30)
+
+    async def scenario():
+        assert (await client.fetch("/polls?limit=5")).status == 503
+        assert (await client.fetch("/polls?limit=5")).status == 503
+        with pytest.raises(CircuitOpenError):
+            await client.fetch("/polls?limit=5")
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+
+
+def test_cancelled_half_open_trial_reopens_the_breaker():
+    async def hang(path, token):
+        await asyncio.Event().wait()
+
+    client, calls = make_client(hang)
+    breaker = client.breakers["/polls"] = CircuitBreaker("/polls", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+
+    async def scenario():
+        trial = asyncio.ensure_future(client.fetch("/polls"))
+        while not calls:
+            await asyncio.sleep(0)
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+    asyncio.run(scenario())
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+# Stale cache and single flight
+
+def test_stale_copy_is_served_when_the_refresh_fails():
+    cache = TTLCache("public", ttl=0.01, max_stale=60)
+
+    async def down():
+        raise aiohttp.ClientConnectionError()
+
+    async def erroring():
+        return ApiResponse(503, None)
+
+    async def scenario():
+        await cache.get_or_load("/polls", lambda: asyncio.sleep(0, ok()))
+        await asyncio.sleep(0.02)
+        for loader in (down, erroring):
+            result = await cache.get_or_load("/polls", loader)
+            assert result.ok and result.stale and result.data == POLLS
+
+    asyncio.run(scenario())
+    assert cache.stale_served == 2
+
+
+def test_failure_without_a_stale_copy_is_raised():
+    cache = TTLCache("public", ttl=0.01, max_stale=0)
+
+    async def down():
+        raise aiohttp.ClientConnectionError()
+
+    async def scenario():
+        await cache.get_or_load("/polls", lambda: asyncio.sleep(0, ok()))
+        await asyncio.sleep(0.02)
+        with pytest.raises(aiohttp.ClientConnectionError):
+            await cache.get_or_load("/polls", down)
+
+    asyncio.run(scenario())
+
+
+def test_prefer_stale_answers_at_once_and_revalidates_in_the_background():
+    cache = TTLCache("public", ttl=0.01, max_stale=60)
+    gate = asyncio.Event()
+    fresh = [{"title": "Poll 1"}]
+
+    async def slow_refresh():
+        await gate.wait()
+        return ok(fresh)
+
+    async def scenario():
+        await cache.get_or_load("/polls", lambda: asyncio.sleep(0, ok()))
+        await asyncio.sleep(0.02)
+        result = await cache.get_or_load("/polls", slow_refresh, prefer_stale=True)
+        assert result.stale and result.data == POLLS
+        gate.set()
+        while cache._flights:
+            await asyncio.sleep(0)
+        return await cache.get_or_load("/polls", slow_refresh)
+
+    result = asyncio.run(scenario())
+    assert not result.stale and result.data == fresh
+
+
+def test_concurrent_misses_share_one_load():
+    cache = TTLCache("public", ttl=30)
+    loads = []
+
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def loader():
+            loads.append(1)
+            await gate.wait()
+            return ok()
+
+        waiting = [asyncio.ensure_future(cache.get_or_load("/polls", loader)) for _ in range(10)]
+        await asyncio.sleep(0)
+        gate.set()
+        return await asyncio.gather(*waiting)
+
+    results = asyncio.run(scenario())
+    assert len(loads) == 1
+    assert all(r.data == POLLS for r in results)
+    assert cache.misses == 1 and cache.coalesced == 9
+
+
+# Token trust for auth-required public listings
+
+def test_only_trusted_tokens_are_served_the_shared_copy():
+    async def node(path, token):
+        return ok() if token == "good" else ApiResponse(401, {"error": "Unauthorized"})
+
+    client, calls = make_client(node)
+
+    async def scenario():
+        assert (await client.get_public("/polls", token="good", auth_required=True)).ok
+        assert (await client.get_public("/polls", token="good", auth_required=True)).ok
+        assert len(calls) == 1
+        for _ in range(2):
+            assert (await client.get_public("/polls", token="forged", auth_required=True)).status == 401
+
+    asyncio.run(scenario())
+    assert calls[1:] == [("/polls", "forged"), ("/polls", "forged")]
+
+
+def test_trust_expires(monkeypatch):
+    monkeypatch.setattr(api_client, "TOKEN_TRUST_TTL", 0.01)
+    client, calls = make_client(always_ok)
+
+    async def scenario():
+        await client.get_public("/polls", token="good", auth_required=True)
+        await asyncio.sleep(0.02)
+        # The shared copy is still fresh, but the token has to be checked again
+        await client.get_public("/polls", token="good", auth_required=True)
+
+    asyncio.run(scenario())
+    assert calls == [("/polls", "good"), ("/polls", "good")]
+
+
+def test_revoked_token_loses_trust():
+    revoked = set()
+
+    async def node(path, token):
+        return ApiResponse(401, None) if token in revoked else ok()
+
+    client, calls = make_client(node, public_ttl=0.01)
+
+    async def scenario():
+        assert (await client.get_public("/polls", token="t", auth_required=True)).ok
+        revoked.add("t")
+        await asyncio.sleep(0.02)
+        assert (await client.get_public("/polls", token="t", auth_required=True)).status == 401
+
+    asyncio.run(scenario())
+    assert not client._is_trusted("t")
+
+
+def test_request_rejected_for_another_token_is_retried_with_your_own():
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def node(path, token):
+            await gate.wait()
+            return ApiResponse(401, None) if token == "revoked" else ok()
+
+        client, calls = make_client(node, public_ttl=0)
+        client._trust("revoked", True)
+        client._trust("good", True)
+        first = asyncio.ensure_future(client.get_public("/polls", token="revoked", auth_required=True))
+        second = asyncio.ensure_future(client.get_public("/polls", token="good", auth_required=True))
+        await asyncio.sleep(0)
+        gate.set()
+        return await first, await second, calls
+
+    first, second, calls = asyncio.run(scenario())
+    assert first.status == 401 and second.ok
+    assert calls == [("/polls", "revoked"), ("/polls", "good")]
+
+
+def test_stale_copy_does_not_renew_trust():
+    down = []
+
+    async def node(path, token):
+        if down:
+            raise aiohttp.ClientConnectionError()
+        return ok()
+
+    client, calls = make_client(node, public_ttl=0.01, max_stale=60)
+    client.breakers["/polls"] = CircuitBreaker("/polls", failure_threshold=1, reset_timeout=30)
+
+    async def scenario():
+        await client.get_public("/polls", token="t", auth_required=True)
+        trusted_until = client._trusted_tokens[client._token_key("t")]
+        down.append(True)
+        await asyncio.sleep(0.02)
+        result = await client.get_public("/polls", token="t", auth_required=True)
+        assert result.ok and result.stale
+        return trusted_until
+
+    trusted_until = asyncio.run(scenario())
+    assert client._trusted_tokens[client._token_key("t")] == trusted_until
+
+
+# Concurrency limit and metrics server
+
+def test_waiting_for_a_slot_counts_against_the_timeout():
+    async def scenario():
+        client = NodeApiClient(base_url="http://node.test/api", max_concurrency=1)
+        client._get_session()
+        await client._semaphore.acquire()
+        try:
+            with pytest.raises(asyncio.TimeoutError):
+                await client._get("/polls", "", 0.05)
+        finally:
+            client._semaphore.release()
+            await client.close()
+
+    asyncio.run(scenario())
+
+
+def test_metrics_server_is_started_once():
+    async def scenario():
+        client = NodeApiClient(base_url="http://node.test/api", metrics_port=9)
+        started = []
+
+        async def start():
+            started.append(True)
+
+        client._start_metrics_server = start
+        await client._get_session().close()
+        client._get_session()
+        await asyncio.sleep(0)
+        await client.close()
+        return started
+
+    assert asyncio.run(scenario()) == [True]
+
+
+def test_metrics_port_in_use_is_not_fatal(caplog):
+    async def scenario():
+        blocker = await asyncio.start_server(lambda r, w: None, "127.0.0.1", 0)
+        port = blocker.sockets[0].getsockname()[1]
+        client = NodeApiClient(base_url="http://node.test/api", metrics_port=port)
+        assert client.metrics_host == "127.0.0.1"
+        await client._start_metrics_server()
+        blocker.close()
+        await blocker.wait_closed()
+        return client
+
+    client = asyncio.run(scenario())
+    assert client._metrics_runner is None
+    assert "Could not serve Node API client metrics" in caplog.text
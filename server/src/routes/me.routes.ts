@@ -3,6 +3,7 @@ import { requireAuth } from '../middleware/auth';
 import User from '../models/User';
 import Registration from '../models/Registration';
 import Achievement from '../models/Achievement';
+import { findPage, parsePageRequest } from '../utils/pagination';
 
 const router = Router();
 
@@ -21,7 +22,11 @@ router.get('/profile', requireAuth, async (req: Request, res: Response) => {
 // GET /api/me/ideas
 router.get('/ideas', requireAuth, async (req: Request, res: Response) => {
   try {
-    const items = await Registration.find({ userId: req.auth!.userId, formType: 'idea' }).sort({ createdAt: -1 });
+    const filter = { userId: req.auth!.userId, formType: 'idea' };
+    const page = parsePageRequest(req, ['data.title', 'data.ideaTitle', 'data.status', 'status']);
+    if (page?.error) return res.status(400).json({ message: page.error });
+    if (page) return res.json(await findPage(Registration, filter, page));
+    const items = await Registration.find(filter).sort({ createdAt: -1 });
     res.json(items);
   } catch (err) {
     console.error('[Me] ideas error', err);
@@ -32,7 +37,11 @@ router.get('/ideas', requireAuth, async (req: Request, res: Response) => {
 // GET /api/me/achievements
 router.get('/achievements', requireAuth, async (req: Request, res: Response) => {
   try {
-    const items = await Achievement.find({ createdBy: req.auth!.userId }).sort({ createdAt: -1 });
+    const filter = { createdBy: req.auth!.userId };
+    const page = parsePageRequest(req, ['eventName', 'eventType', 'dateOfParticipation', 'meritPosition', 'status']);
+    if (page?.error) return res.status(400).json({ message: page.error });
+    if (page) return res.json(await findPage(Achievement, filter, page));
+    const items = await Achievement.find(filter).sort({ createdAt: -1 });
     res.json(items);
   } catch (err) {
     console.error('[Me] achievements error', err);
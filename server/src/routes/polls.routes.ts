@@ -2,6 +2,7 @@ import { Router, Request, Response } from 'express';
 import { requireAuth, requireAdmin } from '../middleware/auth';
 import Poll from '../models/Poll';
 import User from '../models/User';
+import { findPage, parsePageRequest } from '../utils/pagination';
 
 const router = Router();
 
@@ -108,6 +109,10 @@ router.get('/', requireAuth, async (req: Request, res: Response) => {
     ] };
     // Students only see active polls; admin can request all
     const query = (isAdmin && all) ? baseQuery : { ...baseQuery, isActive: true };
+    // Paged, projected listing (used by the chatbot); `hasVoted` is only computed for the full list
+    const page = parsePageRequest(req, ['title', 'description', 'options.text', 'endDate']);
+    if (page?.error) return res.status(400).json({ message: page.error });
+    if (page) return res.json(await findPage(Poll, query, page, '-voters'));
     const polls = await Poll.find(query).sort({ createdAt: -1 });
     const userId = String((req as any).auth?.userId || '');
     const payload = polls.map((p: any) => {
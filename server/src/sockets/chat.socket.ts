@@ -56,7 +56,7 @@ export class ChatSocket {
         try {
           console.log('🤖 Processing message with chatbot...');
           // Process the message with the chatbot
-          const response = await this.chatbot.processMessage(message);
+          const response = await this.chatbot.processMessage(message, socket.id);
           console.log(`🤖 Bot response: ${response.substring(0, 100)}...`);
           
           // Send the bot's response
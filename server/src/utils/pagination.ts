@@ -0,0 +1,85 @@
+import { Request } from 'express';
+import { Model, Types } from 'mongoose';
+
+export const MAX_PAGE_SIZE = 50;
+
+// Newest first, with _id breaking ties so the cursor is unambiguous
+const PAGE_SORT: Record<string, 1 | -1> = { createdAt: -1, _id: -1 };
+
+export interface PageRequest {
+  limit: number;
+  cursor?: { createdAt: Date; id: Types.ObjectId };
+  projection?: string;
+  error?: string;
+}
+
+export interface Page<T> {
+  items: T[];
+  nextCursor: string | null;
+}
+
+function encodeCursor(doc: { createdAt?: Date; _id?: any }): string {
+  return Buffer.from(`${new Date(doc.createdAt as Date).toISOString()}|${doc._id}`).toString('base64');
+}
+
+function decodeCursor(cursor: string): PageRequest['cursor'] | null {
+  const [createdAt, id] = Buffer.from(cursor, 'base64').toString('utf8').split('|');
+  const date = new Date(createdAt);
+  if (!id || isNaN(date.getTime()) || !Types.ObjectId.isValid(id)) return null;
+  return { createdAt: date, id: new Types.ObjectId(id) };
+}
+
+/**
+ * Opt-in pagination for list routes: `?limit=N&cursor=...&fields=a,b.c`.
+ * Returns null when no `limit` is given, so existing clients keep getting the full array.
+ * Only fields in `allowedFields` can be projected.
+ */
+export function parsePageRequest(req: Request, allowedFields: string[]): PageRequest | null {
+  const limit = parseInt(String(req.query.limit || ''), 10);
+  if (!limit || limit < 1) return null;
+
+  const page: PageRequest = { limit: Math.min(limit, MAX_PAGE_SIZE) };
+  if (req.query.cursor) {
+    const cursor = decodeCursor(String(req.query.cursor));
+    if (!cursor) return { ...page, error: 'Invalid cursor' };
+    page.cursor = cursor;
+  }
+  const fields = String(req.query.fields || '')
+    .split(',')
+    .map((f) => f.trim())
+    .filter((f) => allowedFields.includes(f));
+  // createdAt is needed to build the next cursor
+  if (fields.length) page.projection = [...fields, 'createdAt'].join(' ');
+  return page;
+}
+
+/** One page of `filter` from `model` as `{ items, nextCursor }`, using lean documents. */
+export async function findPage<T>(
+  model: Model<T>,
+  filter: Record<string, any>,
+  page: PageRequest,
+  defaultProjection = ''
+): Promise<Page<any>> {
+  const query = page.cursor
+    ? {
+        $and: [
+          filter,
+          {
+            $or: [
+              { createdAt: { $lt: page.cursor.createdAt } },
+              { createdAt: page.cursor.createdAt, _id: { $lt: page.cursor.id } },
+            ],
+          },
+        ],
+      }
+    : filter;
+  const docs: any[] = await model
+    .find(query)
+    .sort(PAGE_SORT)
+    .limit(page.limit + 1)
+    .select(page.projection || defaultProjection)
+    .lean();
+  const items = docs.slice(0, page.limit);
+  const last = items[items.length - 1];
+  return { items, nextCursor: docs.length > page.limit && last ? encodeCursor(last) : null };
+}